@@ -0,0 +1,124 @@
+# --- ARQUIVO DE PEDIDOS PAGOS (DADOS QUENTES E FRIOS) ---
+#
+# A coleção `pedidos` guarda só as comandas abertas e os pedidos pagos
+# recentes. Pedidos pagos há mais de N dias são movidos, em WriteBatches
+# (cópia + exclusão na mesma escrita atômica, então um pedido nunca fica nos
+# dois lugares nem em nenhum), para uma coleção por mês do `pago_em` (no
+# horário local, como os relatórios separam os dias):
+#
+#   pedidos_arquivo_AAAA_MM/<id do pedido>
+#
+# O documento `arquivo_estado/pedidos` guarda até que dia já foi arquivado
+# (`ate`). Os relatórios (relatorios.iterar_pedidos_pagos) leem os meses do
+# arquivo para a parte do período antes desse dia e a coleção `pedidos` para
+# o resto, sem a tela saber de onde veio cada pedido.
+#
+# Para arquivar (ex.: todo dia, pelo cron):
+#   python arquivamento.py arquivar 60
+
+import re
+import sys
+from datetime import date, datetime, time, timedelta
+
+from google.cloud import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+COLECAO_ESTADO = "arquivo_estado"
+PREFIXO_ARQUIVO = "pedidos_arquivo_"
+DIAS_MINIMOS = 7
+# Cada pedido arquivado são duas escritas (cópia e exclusão); o WriteBatch aceita 500.
+PEDIDOS_POR_LOTE = 250
+
+
+def colecao_do_mes(momento):
+    """Coleção do arquivo do mês de `momento`, que é sempre o `pago_em` do pedido (não o `timestamp`)."""
+    if getattr(momento, "tzinfo", None) is not None:
+        momento = momento.astimezone()
+    return f"{PREFIXO_ARQUIVO}{momento.strftime('%Y_%m')}"
+
+
+def meses(inicio, fim):
+    """Primeiro dia de cada mês de `inicio` a `fim` (datas, inclusive)."""
+    mes = inicio.replace(day=1)
+    while mes <= fim:
+        yield mes
+        mes = (mes + timedelta(days=32)).replace(day=1)
+
+
+def arquivado_ate(db):
+    """Dia (date) antes do qual os pedidos pagos podem estar no arquivo, ou None se nunca arquivou."""
+    snapshot = db.collection(COLECAO_ESTADO).document("pedidos").get()
+    ate = (snapshot.to_dict() or {}).get("ate") if snapshot.exists else None
+    return datetime.strptime(ate, '%Y-%m-%d').date() if ate else None
+
+
+def colecoes_do_periodo(db, inicio, fim):
+    """Coleções a ler para os pedidos pagos de `inicio` a `fim`: os meses do arquivo e depois `pedidos`.
+
+    A coleção `pedidos` entra sempre: se um arquivamento parou no meio, os
+    pedidos que faltou mover continuam lá (uma consulta vazia custa uma leitura).
+    """
+    ate = arquivado_ate(db)
+    colecoes = []
+    if ate is not None and inicio < ate:
+        colecoes = [colecao_do_mes(mes) for mes in meses(inicio, min(fim, ate - timedelta(days=1)))]
+    return colecoes + ["pedidos"]
+
+
+def referencias_no_arquivo(db, id_pedido):
+    """Onde um pedido pago pode estar no arquivo, pelo carimbo de abertura no fim do id.
+
+    O pedido costuma ser pago no mês da abertura ou no seguinte. Ids antigos,
+    sem carimbo, não são achados.
+    """
+    encontrado = re.search(r"-(\d{8})\d{12}$", id_pedido)
+    if not encontrado:
+        return []
+    abertura = datetime.strptime(encontrado.group(1), '%Y%m%d').date()
+    candidatos = [abertura.replace(day=1), (abertura.replace(day=1) + timedelta(days=32)).replace(day=1)]
+    return [db.collection(colecao_do_mes(mes)).document(id_pedido) for mes in candidatos]
+
+
+def arquivar(db, dias, hoje=None, pedidos_por_lote=PEDIDOS_POR_LOTE):
+    """Move para o arquivo os pedidos pagos há mais de `dias` dias. Retorna quantos moveu."""
+    if dias < DIAS_MINIMOS:
+        # O histórico da cozinha (hoje, ontem, anteontem) lê só a coleção `pedidos`.
+        raise ValueError(f"Arquive só pedidos com mais de {DIAS_MINIMOS} dias.")
+    limite = (hoje or date.today()) - timedelta(days=dias)
+    # O estado é gravado antes de mover: durante o arquivamento os relatórios já
+    # procuram no arquivo, e o que ainda não foi movido continua em `pedidos`.
+    estado_ref = db.collection(COLECAO_ESTADO).document("pedidos")
+    anterior = arquivado_ate(db)
+    if anterior is None or anterior < limite:
+        estado_ref.set({"ate": limite.strftime('%Y-%m-%d'), "atualizado_em": firestore.SERVER_TIMESTAMP}, merge=True)
+
+    consulta = db.collection("pedidos") \
+        .where(filter=FieldFilter("status", "==", "pago")) \
+        .where(filter=FieldFilter("pago_em", "<", datetime.combine(limite, time.min).astimezone())) \
+        .order_by("pago_em", direction=firestore.Query.ASCENDING) \
+        .limit(pedidos_por_lote)
+    movidos = 0
+    while True:
+        # Os pedidos movidos saem da consulta: cada volta pega os próximos.
+        documentos = list(consulta.stream())
+        if not documentos:
+            return movidos
+        batch = db.batch()
+        for pedido_doc in documentos:
+            pedido = pedido_doc.to_dict()
+            # O mês vem do `pago_em`, não do `timestamp` (hora do último lançamento):
+            # é pelo `pago_em` que os relatórios procuram o pedido no arquivo.
+            destino_ref = db.collection(colecao_do_mes(pedido["pago_em"])).document(pedido_doc.id)
+            batch.set(destino_ref, pedido | {"arquivado_em": firestore.SERVER_TIMESTAMP})
+            batch.delete(pedido_doc.reference)
+        batch.commit()
+        movidos += len(documentos)
+
+
+if __name__ == "__main__":
+    from banco import conectar_firestore
+
+    if len(sys.argv) != 3 or sys.argv[1] != "arquivar":
+        print("Uso: python arquivamento.py arquivar DIAS")
+        sys.exit(1)
+    print(f"{arquivar(conectar_firestore(), int(sys.argv[2]))} pedidos arquivados.")
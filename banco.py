@@ -0,0 +1,17 @@
+# --- CONEXÃO COM O FIRESTORE ---
+#
+# Usada pelo app (com as credenciais do st.secrets) e pelos comandos de linha
+# de comando, que leem o arquivo firestore-chave.json ao lado do código.
+
+import os
+
+from google.cloud import firestore
+
+CAMINHO_CHAVE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "firestore-chave.json")
+
+
+def conectar_firestore(credenciais=None):
+    """Cria o cliente do Firestore a partir do dict de credenciais ou do arquivo de chave."""
+    if credenciais:
+        return firestore.Client.from_service_account_info(credenciais)
+    return firestore.Client.from_service_account_json(CAMINHO_CHAVE)
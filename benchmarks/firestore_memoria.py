@@ -0,0 +1,410 @@
+# --- FIRESTORE EM MEMÓRIA (PARA OS BENCHMARKS) ---
+#
+# Um substituto do `firestore.Client` com o que o app usa: coleções,
+# documentos, consultas (where/order_by/limit/start_after/select),
+# get_all, WriteBatch, transações (@firestore.transactional funciona),
+# on_snapshot e as transformações Increment, ArrayUnion, ArrayRemove,
+# SERVER_TIMESTAMP e DELETE_FIELD.
+#
+# Tudo é contado em `cliente.contadores`: leituras de documentos (como o
+# Firestore cobra: uma por documento devolvido, no mínimo uma por consulta),
+# escritas e chamadas (idas ao servidor). `latencia` simula a rede: cada
+# chamada espera esse tempo, como faria uma conexão lenta.
+
+import copy
+import threading
+import time as _time
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud import firestore
+from google.cloud.firestore_v1.transforms import ArrayRemove, ArrayUnion, Increment
+
+
+class Contadores:
+    def __init__(self):
+        self.leituras = 0
+        self.escritas = 0
+        self.chamadas = 0
+
+    def copia(self):
+        return {"leituras": self.leituras, "escritas": self.escritas, "chamadas": self.chamadas}
+
+    def diferenca(self, antes):
+        return {chave: valor - antes[chave] for chave, valor in self.copia().items()}
+
+
+def _valor(dados, caminho):
+    for parte in caminho.split("."):
+        if not isinstance(dados, dict) or parte not in dados:
+            return None
+        dados = dados[parte]
+    return dados
+
+
+def _chave_ordem(valor):
+    # Ordem de tipos parecida com a do Firestore: nulos, booleanos, números, datas, textos.
+    if valor is None:
+        return (0, 0)
+    if isinstance(valor, bool):
+        return (1, valor)
+    if isinstance(valor, (int, float)):
+        return (2, valor)
+    if isinstance(valor, datetime):
+        return (3, valor.timestamp())
+    return (4, str(valor))
+
+
+def _aplicar_transformacoes(destino, dados):
+    """Grava `dados` sobre `destino` (merge), resolvendo as transformações."""
+    for campo, valor in dados.items():
+        if valor is firestore.DELETE_FIELD:
+            destino.pop(campo, None)
+        elif valor is firestore.SERVER_TIMESTAMP:
+            destino[campo] = datetime.now()
+        elif isinstance(valor, Increment):
+            atual = destino.get(campo)
+            destino[campo] = (atual if isinstance(atual, (int, float)) else 0) + valor.value
+        elif isinstance(valor, ArrayUnion):
+            atual = list(destino.get(campo) or [])
+            destino[campo] = atual + [v for v in valor.values if v not in atual]
+        elif isinstance(valor, ArrayRemove):
+            destino[campo] = [v for v in destino.get(campo) or [] if v not in valor.values]
+        elif isinstance(valor, dict):
+            interno = destino.get(campo)
+            if not isinstance(interno, dict):
+                interno = destino[campo] = {}
+            _aplicar_transformacoes(interno, valor)
+        else:
+            destino[campo] = copy.deepcopy(valor)
+
+
+def _expandir_caminhos(dados):
+    """{"a.b": 1} -> {"a": {"b": 1}} (chaves do update são caminhos de campo)."""
+    expandido = {}
+    for caminho, valor in dados.items():
+        partes = caminho.split(".")
+        atual = expandido
+        for parte in partes[:-1]:
+            atual = atual.setdefault(parte, {})
+        atual[partes[-1]] = valor
+    return expandido
+
+
+class Snapshot:
+    def __init__(self, referencia, dados, campos=None):
+        self.reference = referencia
+        self.id = referencia.id
+        self.exists = dados is not None
+        if dados is not None and campos is not None:
+            dados = {campo: dados[campo] for campo in campos if campo in dados}
+        self._dados = dados
+
+    def to_dict(self):
+        return copy.deepcopy(self._dados) if self._dados is not None else None
+
+    def get(self, campo):
+        return _valor(self._dados or {}, campo)
+
+
+class Documento:
+    def __init__(self, cliente, colecao, doc_id):
+        self._cliente = cliente
+        self._colecao = colecao
+        self.id = doc_id
+        self.parent = Colecao(cliente, colecao)
+        self.path = f"{colecao}/{doc_id}"
+
+    def __eq__(self, outro):
+        return isinstance(outro, Documento) and outro.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def get(self, field_paths=None, transaction=None):
+        self._cliente._chamada()
+        self._cliente.contadores.leituras += 1
+        return self._cliente._snapshot(self)
+
+    def set(self, dados, merge=False):
+        self._cliente._gravar([("set", self, dados, merge)])
+
+    def create(self, dados):
+        self._cliente._gravar([("create", self, dados, False)])
+
+    def update(self, dados):
+        self._cliente._gravar([("update", self, dados, False)])
+
+    def delete(self):
+        self._cliente._gravar([("delete", self, None, False)])
+
+
+class Consulta:
+    def __init__(self, cliente, colecao, filtros=(), ordem=(), limite=None, depois_de=None, campos=None):
+        self._cliente = cliente
+        self._colecao = colecao
+        self._filtros = filtros
+        self._ordem = ordem
+        self._limite = limite
+        self._depois_de = depois_de
+        self._campos = campos
+
+    def _copiar(self, **mudancas):
+        atual = {"filtros": self._filtros, "ordem": self._ordem, "limite": self._limite, "depois_de": self._depois_de, "campos": self._campos}
+        return Consulta(self._cliente, self._colecao, **(atual | mudancas))
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copiar(filtros=self._filtros + ((field_path, op_string, value),))
+
+    def order_by(self, campo, direction="ASCENDING"):
+        return self._copiar(ordem=self._ordem + ((campo, direction),))
+
+    def limit(self, quantidade):
+        return self._copiar(limite=quantidade)
+
+    def start_after(self, snapshot):
+        return self._copiar(depois_de=snapshot.id if hasattr(snapshot, "id") else snapshot)
+
+    def select(self, campos):
+        return self._copiar(campos=tuple(campos))
+
+    def _aceita(self, dados):
+        for campo, operador, esperado in self._filtros:
+            valor = _valor(dados, campo)
+            if operador == "==":
+                ok = valor == esperado
+            elif operador == "!=":
+                ok = valor is not None and valor != esperado
+            elif operador == "in":
+                ok = valor in esperado
+            elif operador == "array_contains":
+                ok = isinstance(valor, list) and esperado in valor
+            elif valor is None or _chave_ordem(valor)[0] != _chave_ordem(esperado)[0]:
+                ok = False
+            elif operador == ">=":
+                ok = _chave_ordem(valor) >= _chave_ordem(esperado)
+            elif operador == ">":
+                ok = _chave_ordem(valor) > _chave_ordem(esperado)
+            elif operador == "<=":
+                ok = _chave_ordem(valor) <= _chave_ordem(esperado)
+            elif operador == "<":
+                ok = _chave_ordem(valor) < _chave_ordem(esperado)
+            else:
+                raise ValueError(f"Operador não suportado: {operador}")
+            if not ok:
+                return False
+        # Como no Firestore, documentos sem o campo de ordenação ficam de fora.
+        return all(_valor(dados, campo) is not None for campo, _direcao in self._ordem)
+
+    def _resultado(self):
+        documentos = self._cliente._dados.get(self._colecao, {})
+        encontrados = [(doc_id, dados) for doc_id, dados in documentos.items() if self._aceita(dados)]
+        encontrados.sort(key=lambda par: par[0])
+        for campo, direcao in reversed(self._ordem):
+            encontrados.sort(key=lambda par: _chave_ordem(_valor(par[1], campo)), reverse=direcao == "DESCENDING")
+        if self._depois_de is not None:
+            ids = [doc_id for doc_id, _dados in encontrados]
+            if self._depois_de in ids:
+                encontrados = encontrados[ids.index(self._depois_de) + 1:]
+        if self._limite is not None:
+            encontrados = encontrados[:self._limite]
+        return [Snapshot(Documento(self._cliente, self._colecao, doc_id), dados, self._campos) for doc_id, dados in encontrados]
+
+    def stream(self, transaction=None):
+        self._cliente._chamada()
+        with self._cliente._trava:
+            resultado = self._resultado()
+        self._cliente.contadores.leituras += max(len(resultado), 1)
+        return iter(resultado)
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+    def on_snapshot(self, callback):
+        return self._cliente._ouvir(self, callback)
+
+
+class Colecao(Consulta):
+    def __init__(self, cliente, nome):
+        super().__init__(cliente, nome)
+        self.id = nome
+
+    def document(self, doc_id=None):
+        return Documento(self._cliente, self._colecao, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, dados):
+        referencia = self.document()
+        referencia.set(dados)
+        return datetime.now(), referencia
+
+
+class Lote:
+    def __init__(self, cliente):
+        self._cliente = cliente
+        self._operacoes = []
+
+    def set(self, referencia, dados, merge=False):
+        self._operacoes.append(("set", referencia, dados, merge))
+
+    def create(self, referencia, dados):
+        self._operacoes.append(("create", referencia, dados, False))
+
+    def update(self, referencia, dados):
+        self._operacoes.append(("update", referencia, dados, False))
+
+    def delete(self, referencia):
+        self._operacoes.append(("delete", referencia, None, False))
+
+    def commit(self):
+        if self._operacoes:
+            self._cliente._gravar(self._operacoes)
+        self._operacoes = []
+
+
+class Transacao(Lote):
+    """Suficiente para @firestore.transactional: as escritas saem juntas no commit."""
+
+    _read_only = False
+    _max_attempts = 5
+
+    def __init__(self, cliente):
+        super().__init__(cliente)
+        self._id = None
+
+    def _clean_up(self):
+        self._operacoes = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._id = uuid.uuid4().bytes
+
+    def _commit(self):
+        self.commit()
+        self._clean_up()
+        return []
+
+    def _rollback(self):
+        self._clean_up()
+
+
+class _Escuta:
+    def __init__(self, cliente, consulta, callback):
+        self._cliente = cliente
+        self.consulta = consulta
+        self.callback = callback
+        self.ultimos = {}
+        self.notificada = False
+        self.is_active = True
+
+    def unsubscribe(self):
+        self.is_active = False
+        with self._cliente._trava:
+            if self in self._cliente._escutas:
+                self._cliente._escutas.remove(self)
+
+
+class FirestoreMemoria:
+    """Cliente falso do Firestore, com contadores de leituras/escritas/chamadas."""
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.contadores = Contadores()
+        self._dados = {}
+        self._escutas = []
+        self._trava = threading.RLock()
+
+    # --- API do cliente ---
+
+    def collection(self, nome):
+        return Colecao(self, nome)
+
+    def batch(self):
+        return Lote(self)
+
+    def transaction(self, **_opcoes):
+        return Transacao(self)
+
+    def get_all(self, referencias, field_paths=None, transaction=None):
+        self._chamada()
+        referencias = list(referencias)
+        self.contadores.leituras += len(referencias)
+        return [self._snapshot(referencia) for referencia in referencias]
+
+    # --- Semeadura (sem contar leituras/escritas) ---
+
+    def semear(self, colecao, doc_id, dados):
+        self._dados.setdefault(colecao, {})[doc_id] = dados
+
+    def quantidade(self, colecao):
+        return len(self._dados.get(colecao, {}))
+
+    # --- Interno ---
+
+    def _chamada(self):
+        self.contadores.chamadas += 1
+        if self.latencia:
+            _time.sleep(self.latencia)
+
+    def _snapshot(self, referencia):
+        with self._trava:
+            return Snapshot(referencia, self._dados.get(referencia._colecao, {}).get(referencia.id))
+
+    def _gravar(self, operacoes):
+        self._chamada()
+        with self._trava:
+            # Valida tudo antes de gravar: o lote é atômico.
+            for tipo, referencia, _dados, _merge in operacoes:
+                existe = referencia.id in self._dados.get(referencia._colecao, {})
+                if tipo == "create" and existe:
+                    raise AlreadyExists(f"Documento já existe: {referencia.path}")
+                if tipo == "update" and not existe:
+                    raise NotFound(f"Documento não encontrado: {referencia.path}")
+            colecoes = set()
+            for tipo, referencia, dados, merge in operacoes:
+                documentos = self._dados.setdefault(referencia._colecao, {})
+                if tipo == "delete":
+                    documentos.pop(referencia.id, None)
+                elif tipo == "update":
+                    _aplicar_transformacoes(documentos[referencia.id], _expandir_caminhos(dados))
+                else:
+                    destino = documentos.get(referencia.id, {}) if merge else {}
+                    _aplicar_transformacoes(destino, dados)
+                    documentos[referencia.id] = destino
+                colecoes.add(referencia._colecao)
+            self.contadores.escritas += len(operacoes)
+            escutas = [escuta for escuta in self._escutas if escuta.consulta._colecao in colecoes]
+        for escuta in escutas:
+            self._notificar(escuta)
+
+    def _ouvir(self, consulta, callback):
+        escuta = _Escuta(self, consulta, callback)
+        with self._trava:
+            self._escutas.append(escuta)
+        self._notificar(escuta)
+        return escuta
+
+    def _notificar(self, escuta):
+        """Envia ao callback só o que mudou desde a última notificação (e conta só isso como leitura)."""
+        with self._trava:
+            resultado = escuta.consulta._resultado()
+        atuais = {snapshot.id: snapshot for snapshot in resultado}
+        mudancas = []
+        for doc_id, snapshot in atuais.items():
+            anterior = escuta.ultimos.get(doc_id)
+            if anterior is None:
+                mudancas.append(SimpleNamespace(type=SimpleNamespace(name="ADDED"), document=snapshot))
+            elif anterior != snapshot._dados:
+                mudancas.append(SimpleNamespace(type=SimpleNamespace(name="MODIFIED"), document=snapshot))
+        for doc_id in escuta.ultimos.keys() - atuais.keys():
+            documento = Snapshot(Documento(self, escuta.consulta._colecao, doc_id), escuta.ultimos[doc_id])
+            mudancas.append(SimpleNamespace(type=SimpleNamespace(name="REMOVED"), document=documento))
+        if not mudancas and escuta.notificada:
+            return
+        escuta.notificada = True
+        escuta.ultimos = {doc_id: copy.deepcopy(snapshot._dados) for doc_id, snapshot in atuais.items()}
+        self.contadores.leituras += max(len(mudancas), 1)
+        escuta.callback(resultado, mudancas, datetime.now())
@@ -0,0 +1,248 @@
+# --- BENCHMARKS DO APP ---
+#
+# Roda as telas de cada cargo (garçom, caixa, cozinha, admin) e os caminhos
+# de lançar e pagar contra o Firestore em memória, com volumes configuráveis,
+# e mostra por cenário: tempo por execução (mediana e máximo), leituras,
+# escritas e chamadas ao Firestore por execução e, com --memoria, o pico de
+# memória alocada.
+#
+#   python benchmarks/rodar.py
+#   python benchmarks/rodar.py --produtos 500 --abertas 2000 --pagos 100000
+#   python benchmarks/rodar.py --latencia 0.15 --json resultado.json
+#
+# As telas rodam com o streamlit.testing (AppTest), no mesmo processo: o
+# `banco.conectar_firestore` é trocado pelo cliente em memória e os arquivos
+# locais (fila de impressão, diário) vão para um diretório temporário.
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time as _time
+import tracemalloc
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import banco
+from firestore_memoria import FirestoreMemoria
+from pedidos import id_comanda_aberta
+from precos import total_itens_centavos
+from relatorios import agregar_periodo, reconstruir_resumos
+from usuarios import gerar_hash_senha
+
+CATEGORIAS = ("Sanduíches", "Cremes", "Bebidas")
+USUARIOS = {"garcom": "garcom", "caixa": "caixa", "cozinha": "cozinha", "admin": "admin"}
+
+
+# --- Dados ---
+
+def semear(db, produtos, abertas, pagos, dias, semente=42):
+    aleatorio = random.Random(semente)
+    for i in range(produtos):
+        categoria = CATEGORIAS[i % len(CATEGORIAS)]
+        db.semear("produtos", f"produto-{i}", {
+            "nome": f"{categoria[:-1]} {i}", "categoria": categoria, "preco_base": round(aleatorio.uniform(5, 40), 2),
+            "permite_carne": categoria == "Sanduíches", "permite_adicional": categoria == "Cremes", "disponivel": aleatorio.random() > 0.05,
+        })
+    for i in range(20):
+        db.semear("opcoes", f"carne-{i}", {"nome_opcao": f"Carne {i}", "tipo": "Carne", "preco_adicional": round(aleatorio.uniform(2, 8), 2)})
+        db.semear("opcoes", f"polpa-{i}", {"nome_opcao": f"Polpa {i}", "tipo": "Polpa", "preco_adicional": round(aleatorio.uniform(1, 4), 2)})
+    senha_hash = gerar_hash_senha("bench")
+    for cargo, nome in USUARIOS.items():
+        db.semear("usuarios", f"usuario-{cargo}", {"nome_usuario": nome, "senha_hash": senha_hash, "cargo": cargo})
+
+    def itens_aleatorios():
+        itens = []
+        for j in range(aleatorio.randint(1, 6)):
+            preco = round(aleatorio.uniform(5, 40), 2)
+            itens.append({"nome": f"Item {aleatorio.randint(0, max(produtos - 1, 0))}", "preco_unitario": preco, "quantidade": aleatorio.randint(1, 3),
+                          "obs": "", "categoria": aleatorio.choice(CATEGORIAS), "id_linha": f"{j}-{aleatorio.getrandbits(64):x}"})
+        return itens
+
+    agora = datetime.now()
+    for i in range(abertas):
+        identificador = f"Mesa {i + 1}"
+        itens = itens_aleatorios()
+        db.semear("pedidos", id_comanda_aberta(identificador), {
+            "identificador": identificador, "tipo_identificador": "Mesa", "garcom": "garcom", "itens": itens,
+            "total_centavos": total_itens_centavos(itens), "status": "novo",
+            "timestamp": agora - timedelta(minutes=abertas - i), "abertura": f"{i:020d}",
+        })
+    for i in range(pagos):
+        momento = agora - timedelta(seconds=aleatorio.uniform(0, dias * 86400))
+        itens = itens_aleatorios()
+        db.semear("pedidos", f"pago-{i}", {
+            "identificador": f"Mesa {aleatorio.randint(1, 40)}", "tipo_identificador": "Mesa", "garcom": aleatorio.choice(("ana", "bia", "caio")),
+            "itens": itens, "total_centavos": total_itens_centavos(itens), "status": "pago", "timestamp": momento, "pago_em": momento,
+        })
+    if pagos:
+        reconstruir_resumos(db, (agora - timedelta(days=dias)).date(), agora.date())
+
+
+# --- Medição ---
+
+def medir(resultados, nome, db, funcao, execucoes=1, memoria=False):
+    tempos = []
+    if memoria:
+        tracemalloc.start()
+    antes = db.contadores.copia()
+    for _ in range(execucoes):
+        inicio = _time.perf_counter()
+        funcao()
+        tempos.append((_time.perf_counter() - inicio) * 1000)
+    diferenca = db.contadores.diferenca(antes)
+    resultado = {
+        "cenario": nome,
+        "execucoes": execucoes,
+        "ms_mediana": round(statistics.median(tempos), 1),
+        "ms_max": round(max(tempos), 1),
+        **{chave: round(valor / execucoes, 1) for chave, valor in diferenca.items()},
+    }
+    if memoria:
+        resultado["memoria_pico_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+    resultados.append(resultado)
+    return resultado
+
+
+def tela(cargo, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(RAIZ, "app.py"), default_timeout=timeout)
+    app.session_state["logged_in"] = True
+    app.session_state["role"] = cargo
+    app.session_state["username"] = USUARIOS[cargo]
+    return app
+
+
+def verificar(app, nome):
+    for excecao in app.exception:
+        # O AppTest não simula reruns só do fragmento: o clique vira um rerun
+        # completo e o st.rerun(scope="fragment") do fim do clique reclama.
+        if 'scope="fragment"' in excecao.message:
+            continue
+        raise RuntimeError(f"{nome}: {excecao.message}")
+
+
+def esperar_diario(db, timeout=30):
+    """Espera o diário local enviar tudo ao Firestore (a thread roda a cada 2 s)."""
+    from diario import DiarioPedidos
+
+    diario = DiarioPedidos(os.path.join(os.environ["DIRETORIO_DADOS"], "diario_pedidos.sqlite3"), db)
+    limite = _time.monotonic() + timeout
+    while diario.contagem().get("pendente") and _time.monotonic() < limite:
+        _time.sleep(0.05)
+
+
+def rodar(argumentos):
+    import streamlit as st
+    from streamlit.logger import set_log_level
+
+    # Menos ruído do Streamlit rodando sem servidor.
+    set_log_level("error")
+
+    db = FirestoreMemoria()
+    print(f"Semeando: {argumentos.produtos} produtos, {argumentos.abertas} comandas abertas, {argumentos.pagos} pedidos pagos em {argumentos.dias} dias...")
+    semear(db, argumentos.produtos, argumentos.abertas, argumentos.pagos, argumentos.dias)
+    db.latencia = argumentos.latencia
+    banco.conectar_firestore = lambda credenciais=None: db
+    st.cache_resource.clear()
+
+    resultados = []
+    reruns = argumentos.reruns
+    memoria = argumentos.memoria
+    timeout = argumentos.timeout
+
+    for cargo in ("garcom", "caixa", "cozinha", "admin"):
+        app = tela(cargo, timeout)
+        medir(resultados, f"{cargo}: primeira execução", db, app.run, memoria=memoria)
+        verificar(app, cargo)
+        medir(resultados, f"{cargo}: rerun", db, app.run, execucoes=reruns, memoria=memoria)
+        verificar(app, cargo)
+
+    # As ações contam a tela e o envio do diário ao Firestore (em segundo
+    # plano); o tempo da tela sozinha é o que o garçom/caixa espera.
+    app = tela("garcom", timeout)
+    app.run()
+    app.session_state["cart"] = [{"nome": "Item bench", "preco_unitario": 12.5, "quantidade": 2, "obs": "", "categoria": "Sanduíches"}]
+    app.run()
+    tempo_tela = []
+
+    def enviar_pedido():
+        inicio = _time.perf_counter()
+        app.button(key="send_order_launcher").click().run()
+        tempo_tela.append((_time.perf_counter() - inicio) * 1000)
+        esperar_diario(db)
+
+    resultado = medir(resultados, "garcom: enviar pedido", db, enviar_pedido, memoria=memoria)
+    resultado["ms_tela"] = round(tempo_tela[-1], 1)
+    verificar(app, "enviar pedido")
+
+    app = tela("caixa", timeout)
+    app.run()
+    # O botão de pagar só aparece com o expander da comanda aberto.
+    comandas = [expander.key for expander in app.expander if str(expander.key).startswith("comanda_")]
+    if comandas:
+        app.session_state[comandas[0]] = True
+        app.run()
+    botoes_pagar = [botao for botao in app.button if str(botao.key).startswith("pay_")]
+    if botoes_pagar:
+        def pagar_comanda():
+            inicio = _time.perf_counter()
+            app.session_state[comandas[0]] = True
+            botoes_pagar[0].click().run()
+            tempo_tela.append((_time.perf_counter() - inicio) * 1000)
+            esperar_diario(db)
+
+        resultado = medir(resultados, "caixa: pagar comanda", db, pagar_comanda, memoria=memoria)
+        resultado["ms_tela"] = round(tempo_tela[-1], 1)
+        verificar(app, "pagar comanda")
+
+    hoje = datetime.now().date()
+    medir(resultados, f"cozinha: relatório de {argumentos.dias} dias", db,
+          lambda: agregar_periodo(db, hoje - timedelta(days=argumentos.dias - 1), hoje), memoria=memoria)
+    return resultados
+
+
+def imprimir(resultados):
+    colunas = ["cenario", "execucoes", "ms_mediana", "ms_max", "ms_tela", "leituras", "escritas", "chamadas"]
+    if any("memoria_pico_kb" in r for r in resultados):
+        colunas.append("memoria_pico_kb")
+    larguras = {c: max(len(c), *(len(str(r.get(c, ""))) for r in resultados)) for c in colunas}
+    print("  ".join(c.ljust(larguras[c]) for c in colunas))
+    for resultado in resultados:
+        print("  ".join(str(resultado.get(c, "")).ljust(larguras[c]) for c in colunas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do app contra um Firestore em memória.")
+    parser.add_argument("--produtos", type=int, default=500)
+    parser.add_argument("--abertas", type=int, default=200)
+    parser.add_argument("--pagos", type=int, default=10000)
+    parser.add_argument("--dias", type=int, default=30, help="Os pedidos pagos se espalham pelos últimos N dias.")
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos de espera por chamada ao Firestore.")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Tempo máximo de cada execução de tela.")
+    parser.add_argument("--memoria", action="store_true", help="Mede o pico de memória (deixa tudo mais lento).")
+    parser.add_argument("--json", help="Grava os resultados neste arquivo.")
+    argumentos = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        os.environ["DIRETORIO_DADOS"] = diretorio
+        os.environ.pop("IMPRESSORA", None)
+        resultados = rodar(argumentos)
+
+    imprimir(resultados)
+    if argumentos.json:
+        with open(argumentos.json, "w", encoding="utf-8") as arquivo:
+            json.dump(resultados, arquivo, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
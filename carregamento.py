@@ -0,0 +1,45 @@
+# --- CARREGAMENTO EM PARALELO DOS DADOS DAS TELAS ---
+#
+# Na primeira execução de uma tela (processo recém-iniciado, espelho
+# invalidado pelo admin ou listener caído) cada espelho em memória
+# (produtos, opções, usuários, comandas abertas) faz uma leitura completa no
+# Firestore. Em sequência, o tempo até a tela aparecer era a soma dessas
+# latências; aqui as leituras saem juntas, num pool de threads compartilhado
+# por todas as sessões, e a tela espera só pelas fontes de que precisa.
+#
+# Com os espelhos já carregados cada tarefa volta na hora, então chamar o
+# carregador em todo rerun não custa nada.
+
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class Carregador:
+    """Roda as funções de carga de uma tela ao mesmo tempo."""
+
+    def __init__(self, max_threads=8):
+        self._pool = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="carregamento")
+
+    def carregar(self, tarefas, envolver=None):
+        """Chama cada função de `tarefas` (sem argumentos) e espera todas terminarem.
+
+        `envolver`, se dado, embrulha cada tarefa antes de mandá-la ao pool
+        (ex.: para as leituras contarem no rerun que pediu). Retorna a lista
+        de exceções; quem chama decide se avisa ou deixa a tela tentar de novo.
+        """
+        if envolver is not None:
+            tarefas = [envolver(tarefa) for tarefa in tarefas]
+        if len(tarefas) <= 1:
+            # Uma tarefa só não ganha nada indo para outra thread.
+            erros = []
+            for tarefa in tarefas:
+                try:
+                    tarefa()
+                except Exception as e:
+                    erros.append(e)
+            return erros
+        futuros = [self._pool.submit(tarefa) for tarefa in tarefas]
+        wait(futuros)
+        return [futuro.exception() for futuro in futuros if futuro.exception() is not None]
+
+    def fechar(self):
+        self._pool.shutdown(wait=False)
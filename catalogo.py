@@ -0,0 +1,113 @@
+# --- CACHE DO CARDÁPIO (produtos e opções) ---
+#
+# Um único CatalogoCache por processo atende todas as sessões do Streamlit.
+# Os dados vêm de espelhos em memória das coleções `produtos` e `opcoes`, de
+# modo que os reruns não leem mais o Firestore para montar as telas.
+
+from types import MappingProxyType
+
+from espelho import EspelhoColecao
+
+
+class CatalogoCache:
+    """Produtos e opções do cardápio servidos da memória."""
+
+    def __init__(self, db, ttl_segundos=60, ouvir=True):
+        self._produtos = EspelhoColecao(db.collection("produtos"), ttl_segundos=ttl_segundos, ouvir=ouvir)
+        self._opcoes = EspelhoColecao(db.collection("opcoes"), ttl_segundos=ttl_segundos, ouvir=ouvir)
+        self._indice = None
+
+    def produtos(self):
+        return self._produtos.documentos()
+
+    def opcoes(self):
+        return self._opcoes.documentos()
+
+    @property
+    def versao(self):
+        """Muda sempre que produtos ou opções mudam."""
+        return (self._produtos.versao, self._opcoes.versao)
+
+    def indice(self):
+        """Retorna o IndiceCatalogo da versão atual, reaproveitado entre sessões."""
+        produtos, versao_produtos = self._produtos.documentos_com_versao()
+        opcoes, versao_opcoes = self._opcoes.documentos_com_versao()
+        versao = (versao_produtos, versao_opcoes)
+        indice = self._indice
+        if indice is None or indice.versao != versao:
+            indice = IndiceCatalogo(produtos, opcoes, versao=versao)
+            self._indice = indice
+        return indice
+
+    def invalidar(self):
+        """Chamada pelo painel do admin logo após editar, pausar ou apagar algo."""
+        self._produtos.invalidar()
+        self._opcoes.invalidar()
+
+    def fechar(self):
+        self._produtos.fechar()
+        self._opcoes.fechar()
+
+
+class IndiceCatalogo:
+    """Índice imutável do cardápio, montado uma vez por versão do catálogo.
+
+    Substitui as list comprehensions e os `next(...)` lineares que as telas
+    faziam a cada rerun por consultas diretas em dicionários.
+    """
+
+    __slots__ = ("versao", "produtos_por_categoria", "nomes_por_categoria", "produto_por_nome",
+                 "opcoes_por_tipo", "nomes_opcoes_por_tipo", "opcao_por_nome", "preco_opcao_por_nome")
+
+    def __init__(self, produtos, opcoes, versao=None):
+        por_categoria = {}
+        por_nome = {}
+        for p in produtos:
+            if not p.get("disponivel", True):
+                continue
+            categoria = p.get("categoria")
+            por_categoria.setdefault(categoria, []).append(p)
+            # Nomes repetidos: vale o primeiro, como fazia o `next(...)`.
+            por_nome.setdefault(categoria, {}).setdefault(p.get("nome"), p)
+
+        por_tipo = {}
+        opcao_por_nome = {}
+        for o in opcoes:
+            tipo = o.get("tipo")
+            por_tipo.setdefault(tipo, []).append(o)
+            opcao_por_nome.setdefault(tipo, {}).setdefault(o.get("nome_opcao"), o)
+
+        self.versao = versao
+        self.produtos_por_categoria = MappingProxyType({c: tuple(ps) for c, ps in por_categoria.items()})
+        self.nomes_por_categoria = MappingProxyType({c: tuple(p.get("nome") for p in ps) for c, ps in por_categoria.items()})
+        self.produto_por_nome = MappingProxyType({c: MappingProxyType(m) for c, m in por_nome.items()})
+        self.opcoes_por_tipo = MappingProxyType({t: tuple(os_) for t, os_ in por_tipo.items()})
+        self.nomes_opcoes_por_tipo = MappingProxyType({t: tuple(o.get("nome_opcao") for o in os_) for t, os_ in por_tipo.items()})
+        self.opcao_por_nome = MappingProxyType({t: MappingProxyType(m) for t, m in opcao_por_nome.items()})
+        self.preco_opcao_por_nome = MappingProxyType({
+            t: MappingProxyType({nome: o.get("preco_adicional", 0) for nome, o in m.items()})
+            for t, m in opcao_por_nome.items()
+        })
+
+    def __setattr__(self, nome, valor):
+        if hasattr(self, nome):
+            raise AttributeError("IndiceCatalogo é imutável")
+        object.__setattr__(self, nome, valor)
+
+    def produtos(self, categoria):
+        return self.produtos_por_categoria.get(categoria, ())
+
+    def nomes(self, categoria):
+        return self.nomes_por_categoria.get(categoria, ())
+
+    def produto(self, categoria, nome):
+        return self.produto_por_nome.get(categoria, {}).get(nome)
+
+    def nomes_opcoes(self, tipo):
+        return self.nomes_opcoes_por_tipo.get(tipo, ())
+
+    def opcao(self, tipo, nome):
+        return self.opcao_por_nome.get(tipo, {}).get(nome)
+
+    def preco_opcao(self, tipo, nome):
+        return self.preco_opcao_por_nome.get(tipo, {}).get(nome, 0)
@@ -0,0 +1,173 @@
+# --- OPERAÇÕES EM LOTE NO CARDÁPIO (produtos e opções) ---
+#
+# Pausar, ativar, apagar, reajustar preços e importar um CSV viram um
+# "plano": a lista das mudanças documento a documento, calculada a partir do
+# catálogo em memória, sem tocar no Firestore. O admin confere o plano (a
+# prévia mostra campo, valor antigo e novo) e só então ele é gravado em
+# WriteBatches de até 500 escritas, seguido de um único `catalogo.invalidar()`.
+#
+# Cada mudança é uma tupla (acao, doc_id, antes, depois), com acao "criar",
+# "alterar" ou "apagar"; em "alterar", `depois` traz só os campos que mudam.
+
+import csv
+import io
+
+from precos import centavos, reais
+
+CAMPOS = {
+    "produtos": ("nome", "categoria", "preco_base", "permite_carne", "permite_adicional", "disponivel"),
+    "opcoes": ("nome_opcao", "tipo", "preco_adicional"),
+}
+CAMPO_NOME = {"produtos": "nome", "opcoes": "nome_opcao"}
+CAMPO_PRECO = {"produtos": "preco_base", "opcoes": "preco_adicional"}
+CAMPOS_PRECO = ("preco_base", "preco_adicional")
+CAMPOS_BOOLEANOS = ("permite_carne", "permite_adicional", "disponivel")
+PADROES = {"produtos": {"disponivel": True, "permite_carne": False, "permite_adicional": False}, "opcoes": {}}
+
+MAX_ESCRITAS_POR_LOTE = 500
+
+
+def _por_id(documentos, ids):
+    selecionados = set(ids)
+    return [doc for doc in documentos if doc.get("id") in selecionados]
+
+
+def planejar_disponibilidade(documentos, ids, disponivel):
+    """Pausar (False) ou ativar (True) os produtos escolhidos; os que já estão assim ficam de fora."""
+    return [
+        ("alterar", doc["id"], {"disponivel": doc.get("disponivel", True)}, {"disponivel": disponivel})
+        for doc in _por_id(documentos, ids)
+        if doc.get("disponivel", True) != disponivel
+    ]
+
+
+def planejar_exclusao(documentos, ids):
+    return [("apagar", doc["id"], {k: v for k, v in doc.items() if k != "id"}, None) for doc in _por_id(documentos, ids)]
+
+
+def planejar_reajuste(colecao, documentos, ids, percentual):
+    """Reajusta o preço dos escolhidos em `percentual` % (negativo para desconto), arredondando nos centavos."""
+    campo = CAMPO_PRECO[colecao]
+    mudancas = []
+    for doc in _por_id(documentos, ids):
+        antes = doc.get(campo, 0) or 0
+        antes_centavos = centavos(antes)
+        # Conta em centavos inteiros, arredondando a metade para cima.
+        depois = reais(max((antes_centavos * (10000 + round(percentual * 100)) + 5000) // 10000, 0))
+        if depois != antes:
+            mudancas.append(("alterar", doc["id"], {campo: antes}, {campo: depois}))
+    return mudancas
+
+
+# --- CSV ---
+
+def exportar_csv(colecao, documentos):
+    """CSV (texto) com o id e os campos do cardápio, pronto para editar e importar de volta."""
+    saida = io.StringIO()
+    escritor = csv.writer(saida)
+    escritor.writerow(("id",) + CAMPOS[colecao])
+    for doc in documentos:
+        escritor.writerow([doc.get("id", "")] + [doc.get(campo, "") for campo in CAMPOS[colecao]])
+    return saida.getvalue()
+
+
+def _converter(campo, valor, numero_linha):
+    valor = (valor or "").strip()
+    if not valor:
+        return None
+    if campo in CAMPOS_PRECO:
+        try:
+            return round(float(valor.replace(",", ".")), 2)
+        except ValueError:
+            raise ValueError(f"Linha {numero_linha}: preço inválido em '{campo}': {valor!r}")
+    if campo in CAMPOS_BOOLEANOS:
+        if valor.lower() in ("true", "1", "sim", "s", "verdadeiro"):
+            return True
+        if valor.lower() in ("false", "0", "nao", "não", "n", "falso"):
+            return False
+        raise ValueError(f"Linha {numero_linha}: valor inválido em '{campo}': {valor!r} (use sim/não)")
+    return valor
+
+
+def planejar_importacao(colecao, documentos, texto_csv):
+    """Compara o CSV com o catálogo atual e retorna as mudanças (sem gravar nada).
+
+    Linhas com `id` conhecido alteram o documento; linhas sem `id` são
+    casadas pelo nome (e categoria/tipo) ou viram documentos novos, que
+    precisam de nome, categoria/tipo e preço. Colunas ausentes (ou células
+    vazias) no CSV não são mexidas. Documentos fora do CSV não são apagados.
+    """
+    campos = CAMPOS[colecao]
+    campo_nome = CAMPO_NOME[colecao]
+    campo_grupo = "categoria" if colecao == "produtos" else "tipo"
+    existentes = {doc["id"]: doc for doc in documentos}
+    por_nome = {(doc.get(campo_nome), doc.get(campo_grupo)): doc for doc in documentos}
+    so_nome = {}
+    for doc in documentos:
+        so_nome.setdefault(doc.get(campo_nome), []).append(doc)
+
+    leitor = csv.DictReader(io.StringIO(texto_csv.lstrip("\ufeff")))
+    colunas = [c for c in (leitor.fieldnames or ()) if c in campos]
+    if campo_nome not in colunas:
+        raise ValueError(f"O CSV precisa da coluna '{campo_nome}'.")
+
+    mudancas = []
+    for numero_linha, linha in enumerate(leitor, start=2):
+        dados = {campo: _converter(campo, linha.get(campo), numero_linha) for campo in colunas}
+        # Células vazias mantêm o valor atual.
+        dados = {campo: valor for campo, valor in dados.items() if valor is not None}
+        doc_id = (linha.get("id") or "").strip()
+        if not doc_id and campo_nome not in dados:
+            raise ValueError(f"Linha {numero_linha}: '{campo_nome}' vazio.")
+        if doc_id:
+            atual = existentes.get(doc_id)
+        elif campo_grupo in dados:
+            atual = por_nome.get((dados[campo_nome], dados[campo_grupo]))
+        else:
+            # Sem categoria/tipo, casa pelo nome se ele for único no catálogo.
+            mesmos = so_nome.get(dados[campo_nome], [])
+            atual = mesmos[0] if len(mesmos) == 1 else None
+        if doc_id and atual is None:
+            raise ValueError(f"Linha {numero_linha}: id '{doc_id}' não existe em '{colecao}'.")
+        if atual is None:
+            faltando = [campo for campo in (campo_grupo, CAMPO_PRECO[colecao]) if campo not in dados]
+            if faltando:
+                raise ValueError(f"Linha {numero_linha}: '{dados[campo_nome]}' é novo e precisa de {', '.join(faltando)}.")
+            mudancas.append(("criar", None, None, PADROES[colecao] | dados))
+            continue
+        alterados = {campo: valor for campo, valor in dados.items() if atual.get(campo) != valor}
+        if alterados:
+            mudancas.append(("alterar", atual["id"], {campo: atual.get(campo) for campo in alterados}, alterados))
+    return mudancas
+
+
+# --- Prévia e gravação ---
+
+def descrever(mudancas, documentos, colecao):
+    """Linhas da prévia: uma por campo alterado (ação, item, campo, antes, depois)."""
+    nomes = {doc["id"]: doc.get(CAMPO_NOME[colecao]) for doc in documentos}
+    linhas = []
+    for acao, doc_id, antes, depois in mudancas:
+        item = nomes.get(doc_id) or (depois or {}).get(CAMPO_NOME[colecao]) or doc_id
+        if acao == "apagar":
+            linhas.append({"Ação": acao, "Item": item, "Campo": "", "Antes": "", "Depois": ""})
+            continue
+        for campo, valor in depois.items():
+            linhas.append({"Ação": acao, "Item": item, "Campo": campo, "Antes": "" if antes is None else str(antes.get(campo, "")), "Depois": str(valor)})
+    return linhas
+
+
+def aplicar(db, colecao, mudancas):
+    """Grava o plano em WriteBatches de até 500 escritas. Retorna o número de escritas."""
+    ref_colecao = db.collection(colecao)
+    for i in range(0, len(mudancas), MAX_ESCRITAS_POR_LOTE):
+        batch = db.batch()
+        for acao, doc_id, _antes, depois in mudancas[i:i + MAX_ESCRITAS_POR_LOTE]:
+            if acao == "criar":
+                batch.set(ref_colecao.document(), depois)
+            elif acao == "alterar":
+                batch.update(ref_colecao.document(doc_id), depois)
+            else:
+                batch.delete(ref_colecao.document(doc_id))
+        batch.commit()
+    return len(mudancas)
@@ -0,0 +1,148 @@
+# --- PAINEL DA COZINHA (KDS) ---
+#
+# Cada lançamento vira um ticket por estação em `tickets_cozinha/<id>`, com
+# os itens daquela estação. O ticket é gravado no mesmo WriteBatch que
+# acrescenta os itens na comanda (pedidos.aplicar_acrescimos_em_lote), com
+# id derivado do `id_linha` do primeiro item, então reenviar um lote não
+# duplica tickets.
+#
+# O ticket passa por novo -> preparando -> pronto, guardando quando chegou
+# (`criado_em`), quando começou a ser preparado (`iniciado_em`) e quando
+# ficou pronto (`pronto_em`). A tela da cozinha é um listener só sobre os
+# tickets ainda não prontos: as mudanças chegam como diferenças e os reruns
+# leem a memória, então a tela não depende do tamanho do histórico.
+#
+# Ao ficar pronto, a mesma transação soma o ticket no resumo do dia da
+# cozinha, `resumos_cozinha/<AAAA-MM-DD>`:
+#
+#   tickets, itens, espera_segundos, preparo_segundos -> totais do dia
+#   estacoes.<estacao>.tickets/preparo_segundos       -> por estação
+#   horas.<HH>.tickets                                -> por hora
+#
+# As métricas (tickets por hora, tempo médio de preparo) vêm desse documento.
+
+from datetime import datetime, timezone
+
+from google.cloud import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from estacoes import separar_por_estacao
+from relatorios import chave_dia
+
+COLECAO_TICKETS = "tickets_cozinha"
+COLECAO_RESUMOS_COZINHA = "resumos_cozinha"
+
+NOVO = "novo"
+PREPARANDO = "preparando"
+PRONTO = "pronto"
+PROXIMO_STATUS = {NOVO: PREPARANDO, PREPARANDO: PRONTO}
+
+
+def _local(momento):
+    """Datas do Firestore chegam em UTC; as contas são feitas no horário local, sem fuso."""
+    if momento is not None and getattr(momento, "tzinfo", None) is not None:
+        momento = momento.astimezone().replace(tzinfo=None)
+    return momento
+
+
+def segundos_entre(inicio, fim):
+    inicio, fim = _local(inicio), _local(fim)
+    if inicio is None or fim is None:
+        return 0
+    return max(int((fim - inicio).total_seconds()), 0)
+
+
+def gravar_tickets(batch, db, identificador, garcom, itens):
+    """Acrescenta ao batch um ticket por estação com os itens novos de um lançamento."""
+    for estacao, itens_estacao in separar_por_estacao(itens).items():
+        ticket_id = f"{itens_estacao[0]['id_linha']}-{estacao}"
+        batch.set(db.collection(COLECAO_TICKETS).document(ticket_id), {
+            "identificador": identificador,
+            "garcom": garcom,
+            "estacao": estacao,
+            "itens": [{"nome": item.get("nome"), "quantidade": item.get("quantidade", 1), "obs": item.get("obs", "")} for item in itens_estacao],
+            "status": NOVO,
+            "criado_em": firestore.SERVER_TIMESTAMP,
+        })
+
+
+def consulta_tickets_ativos(db):
+    """Tickets ainda não prontos, na ordem em que chegaram."""
+    return db.collection(COLECAO_TICKETS) \
+        .where(filter=FieldFilter("status", "in", [NOVO, PREPARANDO])) \
+        .order_by("criado_em", direction=firestore.Query.ASCENDING)
+
+
+def agrupar_por_estacao(tickets):
+    """{estacao: [tickets na ordem de chegada]}."""
+    por_estacao = {}
+    for ticket in tickets:
+        por_estacao.setdefault(ticket.get("estacao"), []).append(ticket)
+    return por_estacao
+
+
+@firestore.transactional
+def _avancar(transaction, db, ticket_ref, status_atual):
+    snapshot = ticket_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return None
+    ticket = snapshot.to_dict()
+    if ticket.get("status") != status_atual or status_atual not in PROXIMO_STATUS:
+        # Outro cozinheiro já mexeu nesse ticket.
+        return None
+    novo_status = PROXIMO_STATUS[status_atual]
+    # Gravado com fuso: o Firestore trataria uma data sem fuso como UTC.
+    agora = datetime.now(timezone.utc)
+    if novo_status == PREPARANDO:
+        transaction.update(ticket_ref, {"status": PREPARANDO, "iniciado_em": agora})
+        return novo_status
+    iniciado_em = ticket.get("iniciado_em") or ticket.get("criado_em")
+    espera = segundos_entre(ticket.get("criado_em"), iniciado_em)
+    preparo = segundos_entre(iniciado_em, agora)
+    transaction.update(ticket_ref, {"status": PRONTO, "pronto_em": agora, "espera_segundos": espera, "preparo_segundos": preparo})
+    itens = sum(item.get("quantidade", 1) for item in ticket.get("itens", []))
+    dia = _local(agora)
+    resumo_ref = db.collection(COLECAO_RESUMOS_COZINHA).document(chave_dia(dia))
+    transaction.set(resumo_ref, {
+        "dia": chave_dia(dia),
+        "tickets": firestore.Increment(1),
+        "itens": firestore.Increment(itens),
+        "espera_segundos": firestore.Increment(espera),
+        "preparo_segundos": firestore.Increment(preparo),
+        "estacoes": {ticket.get("estacao"): {"tickets": firestore.Increment(1), "preparo_segundos": firestore.Increment(preparo)}},
+        "horas": {dia.strftime('%H'): {"tickets": firestore.Increment(1)}},
+    }, merge=True)
+    return novo_status
+
+
+def avancar_ticket(db, ticket_id, status_atual):
+    """Passa o ticket para o próximo status. Retorna o novo status ou None se ele já tinha mudado."""
+    ticket_ref = db.collection(COLECAO_TICKETS).document(ticket_id)
+    return _avancar(db.transaction(), db, ticket_ref, status_atual)
+
+
+def ler_resumo_cozinha(db, data):
+    snapshot = db.collection(COLECAO_RESUMOS_COZINHA).document(chave_dia(data)).get()
+    return snapshot.to_dict() if snapshot.exists else None
+
+
+def metricas(resumo, agora=None):
+    """Tickets por hora e tempos médios (em minutos) a partir do resumo do dia."""
+    resumo = resumo or {}
+    agora = agora or datetime.now()
+    tickets = resumo.get("tickets", 0)
+    horas = resumo.get("horas", {})
+    horas_com_tickets = sum(1 for hora in horas.values() if hora.get("tickets"))
+    por_estacao = {
+        estacao: round(dados.get("preparo_segundos", 0) / dados["tickets"] / 60, 1)
+        for estacao, dados in resumo.get("estacoes", {}).items() if dados.get("tickets")
+    }
+    return {
+        "tickets": tickets,
+        "itens": resumo.get("itens", 0),
+        "tickets_nesta_hora": horas.get(agora.strftime('%H'), {}).get("tickets", 0),
+        "tickets_por_hora": round(tickets / horas_com_tickets, 1) if horas_com_tickets else 0,
+        "espera_media_min": round(resumo.get("espera_segundos", 0) / tickets / 60, 1) if tickets else 0,
+        "preparo_medio_min": round(resumo.get("preparo_segundos", 0) / tickets / 60, 1) if tickets else 0,
+        "preparo_medio_por_estacao_min": por_estacao,
+    }
@@ -0,0 +1,207 @@
+# --- MOTOR DE CUPONS (COMANDA DA COZINHA, CUPOM DE PAGAMENTO, VIAS) ---
+#
+# Cada tipo de cupom é um modelo declarativo (uma tupla de blocos). O modelo
+# é compilado uma vez por largura de papel: os trechos fixos (títulos,
+# separadores, rodapés) já ficam codificados em cp850 e colados, e só os
+# campos variáveis são montados a cada impressão. A saída é uma lista de
+# bytes unida com um único join, pronta para a impressora.
+#
+# Blocos:
+#   ("texto", "literal")                    linha fixa
+#   ("centro", "literal", preenchimento)    linha fixa centralizada
+#   ("separador", caractere)                linha inteira do caractere
+#   ("vazio", n)                            n linhas em branco
+#   ("campo", prefixo, chave, sufixo)       linha com dados[chave]; some se vazio
+#   ("itens", estilo, com_obs)              estilo: "destaque", "simples", "valor" ou "pontilhado"
+#   ("total", rotulo, chave)                rótulo à esquerda e valor à direita
+
+from functools import lru_cache
+
+from precos import centavos, formatar, total_itens_centavos, valor_item_centavos
+
+CODIFICACAO = 'cp850'
+LARGURAS_SUPORTADAS = (32, 42, 48)
+LARGURA_PADRAO = 42
+
+
+def codificar(texto):
+    return texto.encode(CODIFICACAO, errors='replace')
+
+
+def quebrar(texto, largura):
+    """Quebra o texto em linhas de até `largura` colunas, preferindo os espaços."""
+    linhas = []
+    while len(texto) > largura:
+        corte = texto.rfind(" ", 0, largura + 1)
+        if corte <= 0:
+            corte = largura
+        linhas.append(texto[:corte].rstrip())
+        texto = texto[corte:].lstrip()
+    linhas.append(texto)
+    return linhas
+
+
+def linha_com_valor(esquerda, direita, largura, preenchimento=" "):
+    """Texto à esquerda e valor alinhado à direita; nomes longos quebram de linha."""
+    linhas = quebrar(esquerda, largura)
+    ultima = linhas[-1]
+    espaco = largura - len(ultima) - len(direita)
+    if espaco >= 1:
+        linhas[-1] = ultima + preenchimento * espaco + direita
+    else:
+        linhas.append(direita.rjust(largura))
+    return "\n".join(linhas) + "\n"
+
+
+def _texto_item(item, estilo):
+    qtd = item.get('quantidade', 1)
+    nome = item.get('nome', 'Item sem nome')
+    if estilo == "destaque":
+        return f"** {qtd}x {nome} **"
+    return f"{qtd}x {nome}"
+
+
+def _op_campo(prefixo, chave, sufixo, largura):
+    def op(dados, partes):
+        valor = dados.get(chave)
+        if valor is None or valor == "":
+            return
+        linha = f"{prefixo}{valor}{sufixo}"
+        partes.append(codificar("\n".join(quebrar(linha, largura)) + "\n"))
+    return op
+
+
+def _op_itens(estilo, com_obs, largura):
+    preenchimento = "." if estilo == "pontilhado" else " "
+    com_valor = estilo in ("valor", "pontilhado")
+
+    def op(dados, partes):
+        linhas = []
+        for item in dados.get('itens', ()):
+            texto = _texto_item(item, estilo)
+            if com_valor:
+                linhas.append(linha_com_valor(texto, formatar(valor_item_centavos(item)), largura, preenchimento))
+            else:
+                linhas.append("\n".join(quebrar(texto, largura)) + "\n")
+            if com_obs and item.get('obs'):
+                linhas.append("\n".join(quebrar(f"  > Obs: {item.get('obs')}", largura)) + "\n")
+        partes.append(codificar("".join(linhas)))
+    return op
+
+
+def _op_total(rotulo, chave, largura):
+    def op(dados, partes):
+        total = dados.get(chave)
+        total = total_itens_centavos(dados.get('itens', ())) if total is None else centavos(total)
+        partes.append(codificar(linha_com_valor(rotulo, formatar(total), largura)))
+    return op
+
+
+def _texto_fixo(bloco, largura):
+    tipo = bloco[0]
+    if tipo == "texto":
+        return bloco[1][:largura] + "\n"
+    if tipo == "centro":
+        preenchimento = bloco[2] if len(bloco) > 2 else " "
+        texto = bloco[1] if preenchimento == " " else f" {bloco[1]} "
+        return texto.center(largura, preenchimento).rstrip() + "\n"
+    if tipo == "separador":
+        return bloco[1] * largura + "\n"
+    if tipo == "vazio":
+        return "\n" * bloco[1]
+    return None
+
+
+@lru_cache(maxsize=None)
+def compilar(nome_modelo, largura=LARGURA_PADRAO):
+    """Compila o modelo para uma largura: trechos fixos já em bytes, campos como funções."""
+    if largura not in LARGURAS_SUPORTADAS:
+        raise ValueError(f"Largura de papel não suportada: {largura} (use {LARGURAS_SUPORTADAS})")
+    compilado = []
+    fixo = []
+    for bloco in MODELOS[nome_modelo]:
+        texto = _texto_fixo(bloco, largura)
+        if texto is not None:
+            fixo.append(texto)
+            continue
+        if fixo:
+            compilado.append(codificar("".join(fixo)))
+            fixo = []
+        tipo = bloco[0]
+        if tipo == "campo":
+            compilado.append(_op_campo(bloco[1], bloco[2], bloco[3] if len(bloco) > 3 else "", largura))
+        elif tipo == "itens":
+            compilado.append(_op_itens(bloco[1], bloco[2], largura))
+        elif tipo == "total":
+            compilado.append(_op_total(bloco[1], bloco[2], largura))
+        else:
+            raise ValueError(f"Bloco desconhecido no modelo '{nome_modelo}': {tipo}")
+    if fixo:
+        compilado.append(codificar("".join(fixo)))
+    return tuple(compilado)
+
+
+def renderizar(nome_modelo, dados, largura=LARGURA_PADRAO):
+    """Monta o cupom em bytes (cp850) prontos para a impressora."""
+    partes = []
+    for op in compilar(nome_modelo, largura):
+        if op.__class__ is bytes:
+            partes.append(op)
+        else:
+            op(dados, partes)
+    return b"".join(partes)
+
+
+MODELOS = {
+    # Comanda da cozinha/bar: só os itens novos, em destaque.
+    "cozinha": (
+        ("campo", "--- COZINHA/BAR - ", "hora", " ---"),
+        ("campo", "ESTACAO: ", "estacao"),
+        ("campo", "COMANDA: ", "identificador"),
+        ("campo", "GARCOM: ", "garcom"),
+        ("separador", "-"),
+        ("itens", "destaque", True),
+        ("separador", "-"),
+        ("vazio", 3),
+    ),
+    # Cupom entregue ao cliente no pagamento.
+    "pagamento": (
+        ("centro", "CUPOM DE PAGAMENTO", "-"),
+        ("vazio", 1),
+        ("campo", "Comanda: ", "identificador"),
+        ("campo", "Garcom: ", "garcom"),
+        ("campo", "Horario Fechamento: ", "fechamento"),
+        ("separador", "-"),
+        ("itens", "valor", True),
+        ("separador", "-"),
+        ("total", "TOTAL:", "total"),
+        ("vazio", 1),
+        ("centro", "Obrigado pela preferencia!"),
+        ("vazio", 3),
+    ),
+    # Vias da rota de impressão (impressao.py).
+    "via_cozinha": (
+        ("centro", "ASA DE AGUIA"),
+        ("centro", "VIA COZINHA"),
+        ("separador", "-"),
+        ("campo", "PEDIDO: ", "cabecalho"),
+        ("campo", "DATA: ", "data_hora"),
+        ("separador", "-"),
+        ("itens", "pontilhado", False),
+        ("separador", "-"),
+        ("total", "TOTAL:", "total"),
+    ),
+    "via_cremes": (
+        ("vazio", 1),
+        ("separador", "-"),
+        ("centro", "VIA CREMES"),
+        ("separador", "-"),
+        ("campo", "PEDIDO: ", "cabecalho"),
+        ("separador", "-"),
+        ("itens", "simples", False),
+        ("separador", "-"),
+    ),
+    "avanco_papel": (
+        ("vazio", 3),
+    ),
+}
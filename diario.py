@@ -0,0 +1,275 @@
+# --- DIÁRIO LOCAL DE PEDIDOS (GRAVAÇÃO EM SEGUNDO PLANO) ---
+#
+# Lançar itens e pagar comandas não espera mais o Firestore: a operação é
+# gravada num arquivo SQLite local (modo WAL) e a tela segue na hora, já
+# imprimindo a comanda. Uma thread em segundo plano envia as operações ao
+# Firestore na ordem em que foram feitas: os acréscimos seguidos vão juntos
+# num único WriteBatch e os pagamentos passam pela transação de sempre.
+#
+# Sem internet as operações esperam no diário e são reenviadas com espera
+# crescente. Reenviar é seguro: cada item tem um `id_linha` fixo desde o
+# lançamento e os que já estão na comanda são ignorados. Um pagamento de
+# comanda que já não existe fica marcado como conflito para o caixa conferir.
+#
+# Erros de rede (sem conexão, tempo esgotado, serviço indisponível) são
+# tentados sem limite. Os outros (dados recusados pelo Firestore, por
+# exemplo) vão para conflito depois de `max_tentativas` recusas, para uma operação
+# com problema não segurar para sempre as que vieram depois dela.
+
+import json
+import sqlite3
+import threading
+import time as _time
+from contextlib import closing
+from datetime import datetime
+
+from google.api_core import exceptions as erros_google
+
+from pedidos import aplicar_acrescimos_em_lote, fechar_comanda, preparar_itens
+
+ACRESCIMO = "acrescimo"
+PAGAMENTO = "pagamento"
+
+PENDENTE = "pendente"
+SINCRONIZADO = "sincronizado"
+CONFLITO = "conflito"
+
+ERROS_DE_REDE = (
+    OSError,
+    erros_google.ServiceUnavailable,
+    erros_google.DeadlineExceeded,
+    erros_google.InternalServerError,
+    erros_google.TooManyRequests,
+    erros_google.Aborted,
+    erros_google.RetryError,
+)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS operacoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tipo TEXT NOT NULL,
+    dados TEXT NOT NULL,
+    status TEXT NOT NULL,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    recusas INTEGER NOT NULL DEFAULT 0,
+    proxima_tentativa REAL NOT NULL,
+    erro TEXT,
+    criado_em REAL NOT NULL,
+    atualizado_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_operacoes_fila ON operacoes (status, id);
+"""
+
+
+class DiarioPedidos:
+    """Diário durável de acréscimos e pagamentos, enviado ao Firestore por uma thread."""
+
+    # Cada acréscimo grava até 5 documentos (a comanda e um ticket por estação):
+    # 100 por lote ficam dentro do limite de 500 escritas do WriteBatch.
+    def __init__(self, caminho, db, intervalo=2.0, espera_maxima=60.0, tamanho_lote=100, max_tentativas=5):
+        self._caminho = caminho
+        self._max_tentativas = max_tentativas
+        self._db = db
+        self._intervalo = intervalo
+        self._espera_maxima = espera_maxima
+        self._tamanho_lote = tamanho_lote
+        self._parar = threading.Event()
+        self._acordar = threading.Event()
+        self._thread = None
+        with closing(self._conectar()) as con, con:
+            con.executescript(_ESQUEMA)
+            # Diários criados antes da coluna `recusas`.
+            if "recusas" not in {coluna[1] for coluna in con.execute("PRAGMA table_info(operacoes)")}:
+                con.execute("ALTER TABLE operacoes ADD COLUMN recusas INTEGER NOT NULL DEFAULT 0")
+
+    def _conectar(self):
+        con = sqlite3.connect(self._caminho, timeout=10)
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA journal_mode=WAL")
+        return con
+
+    def _registrar(self, tipo, dados):
+        agora = _time.time()
+        with closing(self._conectar()) as con, con:
+            cursor = con.execute(
+                "INSERT INTO operacoes (tipo, dados, status, proxima_tentativa, criado_em, atualizado_em) VALUES (?, ?, ?, ?, ?, ?)",
+                (tipo, json.dumps(dados, ensure_ascii=False), PENDENTE, agora, agora, agora),
+            )
+            id_operacao = cursor.lastrowid
+        self._acordar.set()
+        return id_operacao
+
+    # --- API usada pelas telas ---
+
+    def registrar_acrescimo(self, identificador, tipo_identificador, garcom, itens):
+        """Guarda o lançamento no diário e retorna os itens com `id_linha` (para imprimir)."""
+        itens = preparar_itens(itens)
+        # A hora do lançamento vai junto: a rodada guarda quando foi lançada, não quando subiu.
+        self._registrar(ACRESCIMO, {
+            "identificador": identificador, "tipo_identificador": tipo_identificador, "garcom": garcom, "itens": itens,
+            "em": datetime.now().astimezone().isoformat(),
+        })
+        return itens
+
+    def registrar_pagamento(self, pedido_id, abertura=None, pago_em=None):
+        """Guarda o pagamento no diário com a hora do clique (`pago_em`), que é a que vale no pedido e no resumo."""
+        return self._registrar(PAGAMENTO, {
+            "pedido_id": pedido_id,
+            "abertura": abertura,
+            "pago_em": (pago_em or datetime.now()).astimezone().isoformat(),
+        })
+
+    def acrescimos_pendentes(self):
+        """Lançamentos ainda não enviados, na ordem (para o caixa somar às comandas)."""
+        with closing(self._conectar()) as con:
+            linhas = con.execute("SELECT dados FROM operacoes WHERE tipo = ? AND status = ? ORDER BY id", (ACRESCIMO, PENDENTE)).fetchall()
+        return [json.loads(linha["dados"]) for linha in linhas]
+
+    def pagamentos_pendentes(self, recentes=30.0):
+        """(id, abertura) das comandas pagas no caixa que o quadro ainda não deve mostrar.
+
+        Entram os pagamentos pendentes e os enviados há menos de `recentes`
+        segundos (o espelho das comandas abertas ainda pode não ter visto a
+        comanda sair). A abertura separa a comanda paga da próxima aberta no
+        mesmo id. Pagamentos em conflito não entram: a comanda volta ao quadro.
+        """
+        with closing(self._conectar()) as con:
+            linhas = con.execute(
+                "SELECT dados FROM operacoes WHERE tipo = ? AND (status = ? OR (status = ? AND atualizado_em >= ?))",
+                (PAGAMENTO, PENDENTE, SINCRONIZADO, _time.time() - recentes),
+            ).fetchall()
+        pagamentos = [json.loads(linha["dados"]) for linha in linhas]
+        return {(pagamento["pedido_id"], pagamento.get("abertura")) for pagamento in pagamentos}
+
+    def contagem(self):
+        """{status: quantidade} das operações que ainda pedem atenção (pendentes e conflitos)."""
+        with closing(self._conectar()) as con:
+            linhas = con.execute(
+                "SELECT status, COUNT(*) FROM operacoes WHERE status IN (?, ?) GROUP BY status", (PENDENTE, CONFLITO)
+            ).fetchall()
+        return {linha[0]: linha[1] for linha in linhas}
+
+    def conflitos(self, limite=20):
+        with closing(self._conectar()) as con:
+            linhas = con.execute(
+                "SELECT id, tipo, dados, erro, criado_em FROM operacoes WHERE status = ? ORDER BY id DESC LIMIT ?", (CONFLITO, limite)
+            ).fetchall()
+        return [dict(linha) | {"dados": json.loads(linha["dados"])} for linha in linhas]
+
+    def descartar_conflito(self, id_operacao):
+        with closing(self._conectar()) as con, con:
+            con.execute("DELETE FROM operacoes WHERE id = ? AND status = ?", (id_operacao, CONFLITO))
+
+    # --- Thread de envio ---
+
+    def iniciar(self):
+        self._parar.clear()
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._trabalhar, name="diario-pedidos", daemon=True)
+            self._thread.start()
+        self._acordar.set()
+        return self
+
+    def parar(self, espera=5):
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None:
+            self._thread.join(espera)
+
+    def sincronizar(self):
+        """Envia as operações vencidas, na ordem. Retorna quantas foram concluídas."""
+        agora = _time.time()
+        with closing(self._conectar()) as con:
+            linhas = con.execute(
+                "SELECT * FROM operacoes WHERE status = ? ORDER BY id LIMIT ?", (PENDENTE, self._tamanho_lote)
+            ).fetchall()
+        # Uma operação esperando nova tentativa segura as seguintes: a ordem
+        # (acrescentar antes de pagar) tem que ser mantida.
+        operacoes = []
+        for linha in linhas:
+            if linha["proxima_tentativa"] > agora:
+                break
+            operacoes.append(dict(linha) | {"dados": json.loads(linha["dados"])})
+
+        concluidas = 0
+        i = 0
+        while i < len(operacoes):
+            if operacoes[i]["tipo"] == ACRESCIMO:
+                grupo = []
+                while i < len(operacoes) and operacoes[i]["tipo"] == ACRESCIMO:
+                    grupo.append(operacoes[i])
+                    i += 1
+                if not self._enviar_acrescimos(grupo):
+                    return concluidas
+            else:
+                operacao = operacoes[i]
+                i += 1
+                grupo = [operacao]
+                try:
+                    dados = operacao["dados"]
+                    pago_em = datetime.fromisoformat(dados["pago_em"]) if dados.get("pago_em") else None
+                    pedido_pago = fechar_comanda(self._db, dados["pedido_id"], pago_em)
+                except Exception as e:
+                    if not self._falhou(grupo, e):
+                        return concluidas
+                else:
+                    if pedido_pago is None:
+                        self._marcar(grupo, CONFLITO, "A comanda já foi paga ou não existe mais.")
+                    else:
+                        self._marcar(grupo, SINCRONIZADO)
+            concluidas += len(grupo)
+        return concluidas
+
+    def _enviar_acrescimos(self, grupo):
+        """Envia os acréscimos num lote. Retorna False se eles ficaram esperando nova tentativa."""
+        try:
+            aplicar_acrescimos_em_lote(self._db, [op["dados"] for op in grupo])
+        except Exception as e:
+            if len(grupo) > 1 and not isinstance(e, ERROS_DE_REDE):
+                # Um acréscimo recusado derruba o lote inteiro: manda um por um
+                # para achar qual é e deixar os outros seguirem.
+                return all(self._enviar_acrescimos([op]) for op in grupo)
+            return self._falhou(grupo, e)
+        self._marcar(grupo, SINCRONIZADO)
+        return True
+
+    def _falhou(self, operacoes, erro):
+        """Adia as operações ou, esgotadas as tentativas, as põe em conflito.
+
+        Só as recusas contam para o limite: sem rede a operação espera o quanto for preciso.
+        Retorna True se a fila pode seguir (foram para conflito).
+        """
+        recusada = not isinstance(erro, ERROS_DE_REDE)
+        if not recusada or any(op["recusas"] + 1 < self._max_tentativas for op in operacoes):
+            self._adiar(operacoes, erro, recusada)
+            return False
+        self._marcar(operacoes, CONFLITO, f"Desistiu depois de {self._max_tentativas} tentativas: {erro}")
+        return True
+
+    def _marcar(self, operacoes, status, erro=None):
+        agora = _time.time()
+        with closing(self._conectar()) as con, con:
+            con.executemany(
+                "UPDATE operacoes SET status = ?, erro = ?, tentativas = tentativas + 1, atualizado_em = ? WHERE id = ?",
+                [(status, erro, agora, op["id"]) for op in operacoes],
+            )
+
+    def _adiar(self, operacoes, erro, recusada=False):
+        agora = _time.time()
+        with closing(self._conectar()) as con, con:
+            for op in operacoes:
+                tentativas = op["tentativas"] + 1
+                espera = min(self._intervalo * (2 ** (tentativas - 1)), self._espera_maxima)
+                con.execute(
+                    "UPDATE operacoes SET tentativas = ?, recusas = recusas + ?, erro = ?, proxima_tentativa = ?, atualizado_em = ? WHERE id = ?",
+                    (tentativas, int(recusada), str(erro), agora + espera, agora, op["id"]),
+                )
+
+    def _trabalhar(self):
+        while not self._parar.is_set():
+            self._acordar.clear()
+            try:
+                self.sincronizar()
+            except sqlite3.Error:
+                pass
+            self._acordar.wait(self._intervalo)
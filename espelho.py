@@ -0,0 +1,111 @@
+# --- ESPELHO EM MEMÓRIA DE COLEÇÕES DO FIRESTORE ---
+#
+# Mantém uma cópia local de uma coleção (ou consulta) do Firestore que é
+# compartilhada por todas as sessões do Streamlit no mesmo processo.
+# A cópia fica atualizada por um listener `on_snapshot`; se o listener não
+# puder ser iniciado (ou cair), a consulta é refeita quando o TTL expira.
+
+import threading
+import time as _time
+
+
+class EspelhoColecao:
+    """Cópia em memória de uma consulta do Firestore, atualizada ao vivo."""
+
+    def __init__(self, consulta, ttl_segundos=60, ouvir=True):
+        self._consulta = consulta
+        self._ttl = ttl_segundos
+        self._trava = threading.RLock()
+        self._docs = {}
+        self._ordem = []
+        self._lista = ()
+        self._carregado_em = None
+        self._invalidado = True
+        self._sincronizado = False
+        self._watch = None
+        self.versao = 0
+        if ouvir:
+            self._iniciar_listener()
+
+    def _iniciar_listener(self):
+        try:
+            self._watch = self._consulta.on_snapshot(self._ao_receber_snapshot)
+        except Exception:
+            # Sem listener: o espelho continua funcionando pelo TTL.
+            self._watch = None
+
+    def _listener_ativo(self):
+        return self._watch is not None and self._sincronizado and getattr(self._watch, "is_active", True)
+
+    def _ao_receber_snapshot(self, docs, changes, read_time):
+        """Aplica apenas as diferenças (adicionados/modificados/removidos)."""
+        with self._trava:
+            if not self._sincronizado:
+                # O primeiro snapshot traz a coleção inteira.
+                self._docs = {doc.id: doc.to_dict() | {'id': doc.id} for doc in docs}
+            else:
+                for change in changes:
+                    doc = change.document
+                    if change.type.name == "REMOVED":
+                        self._docs.pop(doc.id, None)
+                    else:
+                        self._docs[doc.id] = doc.to_dict() | {'id': doc.id}
+            self._ordem = [doc.id for doc in docs]
+            self._publicar()
+            self._sincronizado = True
+            self._invalidado = False
+
+    def _publicar(self):
+        self._lista = tuple(self._docs[doc_id] for doc_id in self._ordem if doc_id in self._docs)
+        self._carregado_em = _time.monotonic()
+        self.versao += 1
+
+    def _recarregar(self):
+        docs = list(self._consulta.stream())
+        with self._trava:
+            self._docs = {doc.id: doc.to_dict() | {'id': doc.id} for doc in docs}
+            self._ordem = [doc.id for doc in docs]
+            self._publicar()
+            self._invalidado = False
+
+    def _expirado(self):
+        if self._carregado_em is None:
+            return True
+        return (_time.monotonic() - self._carregado_em) > self._ttl
+
+    def documentos(self):
+        """Retorna uma tupla com os documentos (dicts com 'id'). Não altere os dicts."""
+        with self._trava:
+            if not self._invalidado and (self._listener_ativo() or not self._expirado()):
+                return self._lista
+        self._recarregar()
+        return self._lista
+
+    def documentos_com_versao(self):
+        """Retorna (documentos, versao) lidos juntos, sob a trava do listener.
+
+        Lidos em duas chamadas, um snapshot podia chegar entre elas e os dados
+        antigos ficarem guardados com a versão nova.
+        """
+        self.documentos()
+        with self._trava:
+            return self._lista, self.versao
+
+    def descartar(self, doc_id):
+        """Remove um documento localmente, sem esperar o listener confirmar."""
+        with self._trava:
+            if self._docs.pop(doc_id, None) is not None:
+                self._publicar()
+
+    def invalidar(self):
+        """Força uma nova leitura completa na próxima consulta ao espelho."""
+        with self._trava:
+            self._invalidado = True
+
+    def fechar(self):
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception:
+                pass
+            self._watch = None
@@ -0,0 +1,58 @@
+# --- ESTAÇÕES DE PREPARO (ROTEAMENTO DA COMANDA DA COZINHA) ---
+#
+# Cada item vai para a estação da `categoria` do produto: cremes para o
+# balcão do açaí, sanduíches para a chapa e bebidas para o bar. Cada estação
+# recebe uma comanda só com os seus itens, na sua própria impressora.
+#
+# Impressora de cada estação: st.secrets["impressoras_estacoes"] (ex.:
+# {cremes = "tcp://192.168.0.51:9100"}) ou a variável IMPRESSORA_<ESTACAO>
+# (ex.: IMPRESSORA_BAR). Sem configuração, usa a impressora padrão.
+
+import os
+
+ESTACAO_GERAL = "geral"
+
+# categoria do produto -> estação
+ROTAS = {
+    "Cremes": "cremes",
+    "Sanduíches": "chapa",
+    "Bebidas": "bar",
+}
+
+NOMES_ESTACOES = {
+    "cremes": "ACAI/CREMES",
+    "chapa": "CHAPA",
+    "bar": "BAR",
+    ESTACAO_GERAL: "COZINHA/BAR",
+}
+
+
+def estacao_do_item(item, rotas=ROTAS):
+    categoria = item.get("categoria")
+    if categoria in rotas:
+        return rotas[categoria]
+    # Itens antigos não têm categoria: "creme" no nome ainda vai para os cremes.
+    if "creme" in item.get("nome", "").lower():
+        return rotas.get("Cremes", ESTACAO_GERAL)
+    return ESTACAO_GERAL
+
+
+def separar_por_estacao(itens, rotas=ROTAS):
+    """Agrupa os itens por estação, mantendo a ordem de lançamento."""
+    por_estacao = {}
+    for item in itens:
+        por_estacao.setdefault(estacao_do_item(item, rotas), []).append(item)
+    return por_estacao
+
+
+def impressora_da_estacao(estacao, configuradas=None, padrao=None):
+    """URL da impressora da estação ou, se não houver, a impressora padrão."""
+    if configuradas and configuradas.get(estacao):
+        return configuradas[estacao]
+    return os.environ.get(f"IMPRESSORA_{estacao.upper()}") or padrao
+
+
+def impressoras_das_estacoes(configuradas=None, padrao=None):
+    """{estação: URL} das estações que têm impressora (a própria ou a padrão)."""
+    urls = {estacao: impressora_da_estacao(estacao, configuradas, padrao) for estacao in NOMES_ESTACOES}
+    return {estacao: url for estacao, url in urls.items() if url}
@@ -1,30 +1,147 @@
 # --- INÍCIO DO CÓDIGO DE IMPRESSÃO ---
+#
+# Rotas HTTP usadas pelos agentes de impressão:
+#   /imprimir/pedido/<id_pedido>              um pedido
+#   /imprimir/pedidos?ids=a,b,c               vários pedidos numa resposta só
+#   /imprimir/pedidos?data=AAAA-MM-DD         os pedidos pagos do dia, até
+#                                             MAX_PEDIDOS_POR_LOTE por resposta
+#                                             (se há mais, o cabeçalho
+#                                             X-Proxima-Pagina traz o valor a
+#                                             mandar em &pagina=...)
+#
+# As respostas levam ETag: um agente que consulta de tempos em tempos manda
+# If-None-Match e recebe 304 (sem corpo) quando o cupom não mudou.
 
-# ATENÇÃO: Adapte esta função para buscar dados do seu sistema real.
-def buscar_dados_do_pedido(id_pedido):
-    """
-    Esta função simula a busca de dados de um pedido.
-    Adapte-a para o seu sistema real.
+import threading
+import time as _time
+from datetime import datetime
+
+from flask import Flask, Response, request
+
+from arquivamento import referencias_no_arquivo
+from banco import conectar_firestore
+from cupons import CODIFICACAO, renderizar
+from estacoes import estacao_do_item
+from precos import itens_do_pedido, reais, total_pedido_centavos
+from relatorios import pagina_de_pedidos_pagos
+
+app = Flask(__name__)
+
+LARGURA_CUPOM = 32
+MAX_PEDIDOS_POR_LOTE = 200
+
+
+class CachePedidos:
+    """Cache de leitura dos documentos de `pedidos`, por um tempo curto.
+
+    Pedidos pagos não mudam mais e ficam mais tempo; comandas abertas ainda
+    recebem itens e expiram logo.
     """
-    print(f"DEBUG: Buscando dados para o pedido de ID: {id_pedido}")
-    
-    # Adicionei um creme e mais um item para um teste melhor.
-    dados_ficticios = {
-        "id": "123",
-        "cliente": "Mesa 05",
-        "itens": [
-            {"qtd": 2, "nome": "Coca-Cola Lata", "preco_unit": 5.00},
-            {"qtd": 1, "nome": "Porcao de Fritas G", "preco_unit": 25.00},
-            {"qtd": 1, "nome": "Creme de Acai 500ml", "preco_unit": 18.00}, # ITEM TIPO CREME
-            {"qtd": 1, "nome": "X-Burger Especial", "preco_unit": 20.00},
-        ],
-        "data_hora": "21/07/2025 02:28" # Data/hora atualizada
-    }
-    
-    if str(id_pedido) == dados_ficticios["id"]:
-        return dados_ficticios
-    
-    return None
+
+    def __init__(self, db, ttl_aberto=5, ttl_pago=600, max_itens=2000):
+        self._db = db
+        self._ttl_aberto = ttl_aberto
+        self._ttl_pago = ttl_pago
+        self._max_itens = max_itens
+        self._itens = {}
+        self._trava = threading.Lock()
+
+    def _guardar(self, id_pedido, pedido):
+        ttl = self._ttl_pago if pedido and pedido.get("status") == "pago" else self._ttl_aberto
+        with self._trava:
+            if len(self._itens) >= self._max_itens:
+                self._itens.clear()
+            self._itens[id_pedido] = (_time.monotonic() + ttl, pedido)
+
+    def _do_cache(self, id_pedido):
+        with self._trava:
+            guardado = self._itens.get(id_pedido)
+        if guardado and guardado[0] > _time.monotonic():
+            return True, guardado[1]
+        return False, None
+
+    def obter_varios(self, ids):
+        """Retorna {id: pedido ou None}, buscando todos os que faltam numa única chamada."""
+        encontrados = {}
+        faltando = []
+        for id_pedido in ids:
+            achou, pedido = self._do_cache(id_pedido)
+            if achou:
+                encontrados[id_pedido] = pedido
+            else:
+                faltando.append(id_pedido)
+        if faltando:
+            refs = [self._db.collection("pedidos").document(id_pedido) for id_pedido in faltando]
+            for snapshot in self._db.get_all(refs):
+                if snapshot.exists:
+                    encontrados[snapshot.id] = snapshot.to_dict() | {"id": snapshot.id}
+            # Os que não estão em `pedidos` podem ter ido para o arquivo mensal.
+            refs = [ref for id_pedido in faltando if id_pedido not in encontrados for ref in referencias_no_arquivo(self._db, id_pedido)]
+            if refs:
+                for snapshot in self._db.get_all(refs):
+                    if snapshot.exists:
+                        encontrados[snapshot.id] = snapshot.to_dict() | {"id": snapshot.id}
+            for id_pedido in faltando:
+                self._guardar(id_pedido, encontrados.get(id_pedido))
+        return {id_pedido: encontrados.get(id_pedido) for id_pedido in ids}
+
+    def obter(self, id_pedido):
+        return self.obter_varios([id_pedido])[id_pedido]
+
+
+_db = None
+_cache = None
+_trava_cache = threading.Lock()
+
+
+def cache_pedidos():
+    global _db, _cache
+    if _cache is None:
+        # O servidor atende em várias threads: só uma cria o cliente e o cache.
+        with _trava_cache:
+            if _cache is None:
+                _db = conectar_firestore()
+                _cache = CachePedidos(_db)
+    return _cache
+
+
+def buscar_dados_do_pedido(id_pedido):
+    """Busca o pedido na coleção `pedidos` ou no arquivo (através do cache)."""
+    return cache_pedidos().obter(str(id_pedido))
+
+
+def montar_cupom(pedido):
+    """Cupom em bytes com duas seções: uma geral e uma para cremes."""
+    # --- 1. SEPARAÇÃO DOS ITENS ---
+    itens_gerais = itens_do_pedido(pedido) # A primeira via tem TUDO.
+    # A via de cremes segue a mesma tabela de estações do app (pela categoria
+    # do produto; itens sem categoria com "creme" no nome também vão para ela).
+    itens_creme = [item for item in itens_gerais if estacao_do_item(item) == "cremes"]
+
+    # --- 2. MONTAGEM DO CUPOM (motor de cupons compartilhado com o app) ---
+    momento = pedido.get('pago_em') or pedido.get('timestamp')
+    if isinstance(momento, datetime) and momento.tzinfo is not None:
+        momento = momento.astimezone()
+    cabecalho = f"{pedido['id']} | CLIENTE: {pedido.get('identificador', 'N/A')}"
+    partes = [renderizar("via_cozinha", {
+        "cabecalho": cabecalho,
+        "data_hora": momento.strftime('%d/%m/%Y %H:%M') if isinstance(momento, datetime) else None,
+        "itens": itens_gerais,
+        "total": reais(total_pedido_centavos(pedido)),
+    }, LARGURA_CUPOM)]
+    if itens_creme: # A via de cremes só sai se existir algum creme
+        partes.append(renderizar("via_cremes", {"cabecalho": cabecalho, "itens": itens_creme}, LARGURA_CUPOM))
+    partes.append(renderizar("avanco_papel", {}, LARGURA_CUPOM)) # Pulos de linha para ejetar o papel
+    return b"".join(partes)
+
+
+def responder_cupom(cupom_bytes):
+    """Resposta de texto com ETag; devolve 304 se o agente já tem essa versão."""
+    resposta = Response(cupom_bytes.decode(CODIFICACAO), mimetype='text/plain; charset=utf-8')
+    resposta.add_etag()
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta.make_conditional(request)
+
 
 @app.route('/imprimir/pedido/<id_pedido>')
 def imprimir_pedido(id_pedido):
@@ -37,67 +154,42 @@ def imprimir_pedido(id_pedido):
     if not pedido:
         return "Pedido nao encontrado!", 404
 
-    # --- 1. SEPARAÇÃO DOS ITENS ---
-    itens_gerais = []
-    itens_creme = []
-    
-    # Assumimos que um item é creme se a palavra "creme" estiver no nome.
-    # Você pode criar uma lógica mais robusta se tiver categorias de produtos.
-    for item in pedido['itens']:
-        itens_gerais.append(item) # A primeira via tem TUDO.
-        if 'creme' in item['nome'].lower():
-            itens_creme.append(item)
-
-    # --- 2. MONTAGEM DO CUPOM ---
-    LARGURA_CUPOM = 32
-    
-    # --- PARTE 1: VIA COMPLETA (COZINHA GERAL) ---
-    cupom_texto = "       ASA DE AGUIA\n"
-    cupom_texto += "       VIA COZINHA\n"
-    cupom_texto += "--------------------------------\n"
-    cupom_texto += f"PEDIDO: {pedido['id']} | CLIENTE: {pedido['cliente']}\n"
-    cupom_texto += f"DATA: {pedido['data_hora']}\n"
-    cupom_texto += "--------------------------------\n"
-    
-    total_pedido = 0.0
-    for item in itens_gerais: # Usamos a lista com todos os itens
-        preco_total_item = item['qtd'] * item['preco_unit']
-        total_pedido += preco_total_item
-        
-        linha_item = f"{item['qtd']}x {item['nome']}"
-        preco_str = f"R${preco_total_item:7.2f}"
-        
-        espacos = LARGURA_CUPOM - len(linha_item) - len(preco_str)
-        linha_formatada = linha_item + ("." * espacos) + preco_str
-        
-        cupom_texto += linha_formatada[:LARGURA_CUPOM] + "\n"
-
-    cupom_texto += "--------------------------------\n"
-    
-    texto_total = "TOTAL:"
-    valor_total_str = f"R${total_pedido:7.2f}"
-    espacos = LARGURA_CUPOM - len(texto_total) - len(valor_total_str)
-    linha_total_formatada = texto_total + (" " * espacos) + valor_total_str
-    
-    cupom_texto += linha_total_formatada + "\n"
-    
-    # --- PARTE 2: VIA DE CREMES (SÓ SE EXISTIR) ---
-    if itens_creme: # Este bloco só executa se a lista 'itens_creme' não estiver vazia
-        cupom_texto += "\n"
-        cupom_texto += "--------------------------------\n"
-        cupom_texto += "        VIA CREMES\n"
-        cupom_texto += "--------------------------------\n"
-        cupom_texto += f"PEDIDO: {pedido['id']} | CLIENTE: {pedido['cliente']}\n"
-        cupom_texto += "--------------------------------\n"
-        
-        for item in itens_creme:
-            linha_item = f"{item['qtd']}x {item['nome']}"
-            cupom_texto += linha_item + "\n"
-            
-        cupom_texto += "--------------------------------\n"
-
-    cupom_texto += "\n\n\n" # Pulos de linha para ejetar o papel
-    
-    return Response(cupom_texto, mimetype='text/plain; charset=utf-8')
+    return responder_cupom(montar_cupom(pedido))
+
+
+@app.route('/imprimir/pedidos')
+def imprimir_pedidos():
+    """Vários cupons numa resposta só (ex.: reimpressão no fim da noite)."""
+    if request.args.get('data'):
+        try:
+            dia = datetime.strptime(request.args['data'], '%Y-%m-%d').date()
+        except ValueError:
+            return "Data invalida! Use AAAA-MM-DD.", 400
+        cache_pedidos()
+        # A página vem do cursor (X-Proxima-Pagina da resposta anterior): só ela é lida do Firestore.
+        try:
+            pedidos, proxima_pagina = pagina_de_pedidos_pagos(_db, dia, dia, MAX_PEDIDOS_POR_LOTE, request.args.get('pagina'))
+        except ValueError:
+            return "Pagina invalida! Use o valor do cabecalho X-Proxima-Pagina.", 400
+    else:
+        ids = [i for i in request.args.get('ids', '').split(',') if i.strip()]
+        if not ids:
+            return "Informe ?ids=a,b,c ou ?data=AAAA-MM-DD", 400
+        if len(ids) > MAX_PEDIDOS_POR_LOTE:
+            return f"No maximo {MAX_PEDIDOS_POR_LOTE} pedidos por vez.", 400
+        pedidos = [p for p in cache_pedidos().obter_varios([i.strip() for i in ids]).values() if p]
+        proxima_pagina = None
+
+    if not pedidos:
+        return "Nenhum pedido encontrado!", 404
+
+    resposta = responder_cupom(b"".join(montar_cupom(pedido) for pedido in pedidos))
+    if proxima_pagina:
+        resposta.headers['X-Proxima-Pagina'] = proxima_pagina
+    return resposta
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=5000)
 
 # --- FIM DO CÓDIGO DE IMPRESSÃO ---
@@ -0,0 +1,202 @@
+# --- IMPRESSORAS (BACKENDS DE SAÍDA) ---
+#
+# Cada backend recebe um lote de trabalhos [(texto, nome_documento), ...] e
+# envia tudo de uma vez: uma única escrita no socket, um único documento no
+# spooler do Windows ou uma única gravação em disco.
+#
+# A impressora é escolhida por uma URL:
+#   tcp://192.168.0.50:9100     -> impressora térmica ESC/POS em rede (RAW 9100)
+#   arquivo:///var/spool/asa    -> grava cada cupom como um .txt no diretório
+#   win32://                    -> impressora padrão do Windows
+#   win32://Nome da Impressora  -> impressora específica do Windows
+
+import os
+import select
+import socket
+import threading
+import time as _time
+from datetime import datetime
+from urllib.parse import urlparse, unquote
+
+try:
+    import win32print
+    WINDOWS_PRINTING_ENABLED = True
+except ImportError:
+    WINDOWS_PRINTING_ENABLED = False
+
+CODIFICACAO = 'cp850'
+
+# Comandos ESC/POS
+ESC_INICIALIZAR = b"\x1b@"
+ESC_CORTAR_PAPEL = b"\x1dV\x42\x00"
+
+
+def codificar(dado):
+    """Cupons do cupons.py já chegam em bytes; textos soltos são codificados aqui."""
+    if isinstance(dado, bytes):
+        return dado
+    return dado.encode(CODIFICACAO, errors='replace')
+
+
+class ImpressoraTCP:
+    """Impressora ESC/POS na porta RAW (9100) com uma conexão persistente."""
+
+    def __init__(self, host, porta=9100, timeout=5.0, cortar_papel=True, max_ocioso=60.0):
+        self.host = host
+        self.porta = porta
+        self.timeout = timeout
+        self.cortar_papel = cortar_papel
+        # Depois desse tempo sem uso a conexão é refeita, mesmo parecendo viva.
+        self.max_ocioso = max_ocioso
+        self._socket = None
+        self._ultimo_uso = 0.0
+        self._trava = threading.Lock()
+
+    def __repr__(self):
+        return f"tcp://{self.host}:{self.porta}"
+
+    def _fechada_pelo_outro_lado(self):
+        """True se a impressora fechou a conexão ociosa.
+
+        Um sendall num socket fechado do outro lado ainda "funciona" (os dados
+        vão para o buffer e se perdem), então isso é verificado antes de usar.
+        """
+        try:
+            legivel, _, _ = select.select([self._socket], [], [], 0)
+            if not legivel:
+                return False
+            return self._socket.recv(1, socket.MSG_PEEK) == b""
+        except (OSError, ValueError):
+            return True
+
+    def _conectar(self):
+        if self._socket is not None and (
+            _time.monotonic() - self._ultimo_uso > self.max_ocioso or self._fechada_pelo_outro_lado()
+        ):
+            self._desconectar()
+        if self._socket is None:
+            self._socket = socket.create_connection((self.host, self.porta), timeout=self.timeout)
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        return self._socket
+
+    def _desconectar(self):
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+            self._socket = None
+
+    def montar_lote(self, trabalhos):
+        partes = [ESC_INICIALIZAR]
+        for texto, _documento in trabalhos:
+            partes.append(codificar(texto))
+            if self.cortar_papel:
+                partes.append(ESC_CORTAR_PAPEL)
+        return b"".join(partes)
+
+    def enviar_lote(self, trabalhos):
+        dados = self.montar_lote(trabalhos)
+        with self._trava:
+            try:
+                self._conectar().sendall(dados)
+            except OSError:
+                # A conexão caiu durante o envio: reconecta uma vez.
+                self._desconectar()
+                try:
+                    self._conectar().sendall(dados)
+                except OSError:
+                    self._desconectar()
+                    raise
+            self._ultimo_uso = _time.monotonic()
+
+    def fechar(self):
+        with self._trava:
+            self._desconectar()
+
+
+class ImpressoraArquivo:
+    """Grava os cupons em disco: um .txt por cupom num diretório, ou tudo anexado a um arquivo."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._trava = threading.Lock()
+        self._contador = 0
+
+    def __repr__(self):
+        return f"arquivo://{self.caminho}"
+
+    def enviar_lote(self, trabalhos):
+        with self._trava:
+            if os.path.isdir(self.caminho):
+                carimbo = datetime.now().strftime('%Y%m%d-%H%M%S')
+                for texto, documento in trabalhos:
+                    self._contador += 1
+                    nome = "".join(c if c.isalnum() else "_" for c in documento)
+                    with open(os.path.join(self.caminho, f"{carimbo}-{self._contador:04d}-{nome}.txt"), "wb") as f:
+                        f.write(codificar(texto))
+            else:
+                with open(self.caminho, "ab") as f:
+                    f.write(b"".join(codificar(texto) for texto, _documento in trabalhos))
+
+    def fechar(self):
+        pass
+
+
+class ImpressoraWin32:
+    """Impressora do Windows (padrão ou pelo nome), via pywin32."""
+
+    def __init__(self, nome=None):
+        if not WINDOWS_PRINTING_ENABLED:
+            raise RuntimeError("Biblioteca 'pywin32' não encontrada.")
+        self.nome = nome
+
+    def __repr__(self):
+        return f"win32://{self.nome or ''}"
+
+    def enviar_lote(self, trabalhos):
+        nome_impressora = self.nome or win32print.GetDefaultPrinter()
+        nome_documento = trabalhos[0][1] if len(trabalhos) == 1 else f"{len(trabalhos)} cupons"
+        hPrinter = win32print.OpenPrinter(nome_impressora)
+        try:
+            win32print.StartDocPrinter(hPrinter, 1, (nome_documento, None, "RAW"))
+            try:
+                win32print.StartPagePrinter(hPrinter)
+                win32print.WritePrinter(hPrinter, b"".join(codificar(texto) for texto, _documento in trabalhos))
+                win32print.EndPagePrinter(hPrinter)
+            finally:
+                win32print.EndDocPrinter(hPrinter)
+        finally:
+            win32print.ClosePrinter(hPrinter)
+
+    def fechar(self):
+        pass
+
+
+_impressoras = {}
+_trava_impressoras = threading.Lock()
+
+
+def criar_impressora(url):
+    """Retorna o backend da URL. Há uma única instância (e conexão) por impressora."""
+    with _trava_impressoras:
+        if url not in _impressoras:
+            partes = urlparse(url)
+            if partes.scheme == "tcp":
+                impressora = ImpressoraTCP(partes.hostname, partes.port or 9100)
+            elif partes.scheme == "arquivo":
+                impressora = ImpressoraArquivo(unquote(partes.netloc + partes.path))
+            elif partes.scheme == "win32":
+                impressora = ImpressoraWin32(unquote(partes.netloc + partes.path) or None)
+            else:
+                raise ValueError(f"Tipo de impressora desconhecido: {url}")
+            _impressoras[url] = impressora
+        return _impressoras[url]
+
+
+def impressora_padrao():
+    """URL da impressora configurada pela variável IMPRESSORA ou, no Windows, a impressora padrão."""
+    url = os.environ.get("IMPRESSORA")
+    if url:
+        return url
+    return "win32://" if WINDOWS_PRINTING_ENABLED else None
@@ -0,0 +1,408 @@
+# --- INSTRUMENTAÇÃO (TEMPOS POR RERUN, LEITURAS E ESCRITAS NO FIRESTORE) ---
+#
+# Cada execução do script (rerun) de uma tela vira uma Medicao: duração,
+# documentos lidos e gravados, chamadas e tempo gasto no Firestore, cupons
+# enviados à fila de impressão e o tempo gasto nisso, e as "formas" das
+# consultas feitas (ex.: "pedidos where status == order_by timestamp").
+#
+# O cliente do Firestore é embrulhado por `envolver_cliente`: coleções,
+# consultas, documentos, lotes e transações continuam os mesmos objetos por
+# baixo, só que cronometrados e contados. O que acontece fora de um rerun
+# (listeners, diário, threads) entra na conta "segundo plano".
+#
+# As medições ficam em memória (para o painel de diagnóstico do admin) e,
+# se configurado, vão para um arquivo no formato de texto do Prometheus
+# (reescrito no máximo a cada `intervalo_exportacao` segundos) e para um log
+# JSON com uma linha por rerun. O log cresce a cada rerun, então só é gravado
+# quando um arquivo é pedido (LOG_METRICAS / segredo `log_metricas`).
+
+import functools
+import json
+import os
+import threading
+import time as _time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+SEGUNDO_PLANO = "segundo plano"
+
+
+class Medicao:
+    """Contadores de um rerun de uma tela."""
+
+    def __init__(self, tela):
+        self.tela = tela
+        self.inicio = _time.perf_counter()
+        self.momento = datetime.now()
+        self.ultimo_evento = self.inicio
+        self.duracao_ms = None
+        self.interrompido = False
+        self.leituras = 0
+        self.escritas = 0
+        self.chamadas = 0
+        self.ms_firestore = 0.0
+        self.impressoes = 0
+        self.ms_impressao = 0.0
+        self.consultas = Counter()
+
+    def somar(self, outra):
+        self.leituras += outra.leituras
+        self.escritas += outra.escritas
+        self.chamadas += outra.chamadas
+        self.ms_firestore += outra.ms_firestore
+        self.impressoes += outra.impressoes
+        self.ms_impressao += outra.ms_impressao
+        self.consultas.update(outra.consultas)
+
+    def como_dict(self):
+        return {
+            "momento": self.momento.isoformat(timespec="seconds"),
+            "tela": self.tela,
+            "duracao_ms": round(self.duracao_ms or 0, 1),
+            "interrompido": self.interrompido,
+            "leituras": self.leituras,
+            "escritas": self.escritas,
+            "chamadas": self.chamadas,
+            "ms_firestore": round(self.ms_firestore, 1),
+            "impressoes": self.impressoes,
+            "ms_impressao": round(self.ms_impressao, 1),
+            "consultas": dict(self.consultas),
+        }
+
+
+def percentil(valores, fracao):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(int(round(fracao * (len(ordenados) - 1))), len(ordenados) - 1)]
+
+
+class _Tela:
+    """Acumulado de uma tela desde o início do processo."""
+
+    def __init__(self, janela):
+        self.duracoes = deque(maxlen=janela)
+        self.reruns = 0
+        self.soma_ms = 0.0
+        self.total = Medicao(None)
+
+
+class Instrumentacao:
+    """Guarda as medições do processo (compartilhada por todas as sessões)."""
+
+    def __init__(self, arquivo_metricas=None, arquivo_log=None, historico=300, janela=2000, intervalo_exportacao=10.0):
+        self._arquivo_metricas = arquivo_metricas
+        self._arquivo_log = arquivo_log
+        self._intervalo_exportacao = intervalo_exportacao
+        self._exportado_em = 0.0
+        self._janela = janela
+        self._trava = threading.Lock()
+        self._local = threading.local()
+        self._recentes = deque(maxlen=historico)
+        self._telas = {}
+        self._segundo_plano = Medicao(SEGUNDO_PLANO)
+
+    # --- Reruns ---
+
+    def iniciar(self, tela):
+        medicao = Medicao(tela)
+        medicao.anterior = getattr(self._local, "medicao", None)
+        self._local.medicao = medicao
+        return medicao
+
+    def finalizar(self, medicao, interrompido=False):
+        """Fecha a medição. Um rerun interrompido (st.rerun/st.stop) conta até o último evento registrado."""
+        if medicao.duracao_ms is not None:
+            return
+        fim = medicao.ultimo_evento if interrompido else _time.perf_counter()
+        medicao.duracao_ms = (fim - medicao.inicio) * 1000
+        medicao.interrompido = interrompido
+        anterior = getattr(medicao, "anterior", None)
+        if getattr(self._local, "medicao", None) is medicao:
+            self._local.medicao = anterior
+        if anterior is not None and anterior.duracao_ms is None:
+            # Medição aninhada (ex.: um fragmento dentro do rerun completo).
+            anterior.somar(medicao)
+        with self._trava:
+            tela = self._telas.setdefault(medicao.tela, _Tela(self._janela))
+            tela.duracoes.append(medicao.duracao_ms)
+            tela.reruns += 1
+            tela.soma_ms += medicao.duracao_ms
+            tela.total.somar(medicao)
+            self._recentes.append(medicao.como_dict())
+        self._exportar(medicao)
+
+    @contextmanager
+    def medir(self, tela):
+        medicao = self.iniciar(tela)
+        try:
+            yield medicao
+        finally:
+            self.finalizar(medicao)
+
+    def medido(self, tela):
+        """Decorador: cada chamada da função vira uma medição (útil nos fragmentos)."""
+        def decorador(funcao):
+            @functools.wraps(funcao)
+            def envolvida(*args, **kwargs):
+                with self.medir(tela):
+                    return funcao(*args, **kwargs)
+            return envolvida
+        return decorador
+
+    def propagar(self, funcao):
+        """Embrulha uma função que vai rodar em outra thread para ela contar na medição de quem a criou."""
+        medicao = getattr(self._local, "medicao", None)
+
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            anterior = getattr(self._local, "medicao", None)
+            self._local.medicao = medicao
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                self._local.medicao = anterior
+        return envolvida
+
+    def _atual(self):
+        medicao = getattr(self._local, "medicao", None)
+        if medicao is None or medicao.duracao_ms is not None:
+            return self._segundo_plano
+        return medicao
+
+    # --- Eventos ---
+
+    def registrar_firestore(self, forma=None, leituras=0, escritas=0, ms=0.0, chamada=True):
+        medicao = self._atual()
+        with self._trava:
+            medicao.chamadas += 1 if chamada else 0
+            medicao.leituras += leituras
+            medicao.escritas += escritas
+            medicao.ms_firestore += ms
+            if forma:
+                medicao.consultas[forma] += max(leituras, 1)
+        medicao.ultimo_evento = _time.perf_counter()
+
+    def registrar_impressao(self, ms):
+        medicao = self._atual()
+        with self._trava:
+            medicao.impressoes += 1
+            medicao.ms_impressao += ms
+        medicao.ultimo_evento = _time.perf_counter()
+
+    def envolver_impressao(self, funcao):
+        """Embrulha o `enviar_para_impressora` do app."""
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            inicio = _time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                self.registrar_impressao((_time.perf_counter() - inicio) * 1000)
+        return envolvida
+
+    def envolver_cliente(self, db):
+        return _Embrulho(db, self, "")
+
+    # --- Consultas para o painel ---
+
+    def resumo_por_tela(self):
+        with self._trava:
+            telas = {nome: (list(t.duracoes), t.reruns, t.soma_ms, t.total) for nome, t in self._telas.items()}
+        resumo = []
+        for nome, (duracoes, reruns, soma_ms, total) in sorted(telas.items(), key=lambda t: str(t[0])):
+            resumo.append({
+                "tela": nome,
+                "reruns": reruns,
+                "p50_ms": round(percentil(duracoes, 0.50), 1),
+                "p95_ms": round(percentil(duracoes, 0.95), 1),
+                "max_ms": round(max(duracoes, default=0), 1),
+                "soma_ms": round(soma_ms, 1),
+                "media_ms": round(soma_ms / reruns, 1) if reruns else 0.0,
+                "leituras": total.leituras,
+                "leituras_por_rerun": round(total.leituras / reruns, 1) if reruns else 0.0,
+                "escritas": total.escritas,
+                "ms_firestore_por_rerun": round(total.ms_firestore / reruns, 1) if reruns else 0.0,
+                "impressoes": total.impressoes,
+                "ms_impressao_por_rerun": round(total.ms_impressao / reruns, 1) if reruns else 0.0,
+            })
+        return resumo
+
+    def segundo_plano(self):
+        with self._trava:
+            return self._segundo_plano.como_dict()
+
+    def recentes(self, limite=50):
+        with self._trava:
+            return list(self._recentes)[-limite:][::-1]
+
+    def consultas_mais_lidas(self, limite=20):
+        """Formas de consulta que mais leram documentos, somando todas as telas e o segundo plano."""
+        total = Counter()
+        with self._trava:
+            for tela in self._telas.values():
+                total.update(tela.total.consultas)
+            total.update(self._segundo_plano.consultas)
+        return total.most_common(limite)
+
+    # --- Exportação ---
+
+    def texto_prometheus(self):
+        linhas = [
+            "# HELP cardapio_rerun_ms Duração dos reruns por tela, em milissegundos.",
+            "# TYPE cardapio_rerun_ms summary",
+        ]
+        resumo = self.resumo_por_tela()
+        for tela in resumo:
+            rotulo = f'tela="{tela["tela"]}"'
+            linhas.append(f'cardapio_rerun_ms{{{rotulo},quantile="0.5"}} {tela["p50_ms"]}')
+            linhas.append(f'cardapio_rerun_ms{{{rotulo},quantile="0.95"}} {tela["p95_ms"]}')
+            linhas.append(f'cardapio_rerun_ms_sum{{{rotulo}}} {tela["soma_ms"]}')
+            linhas.append(f'cardapio_rerun_ms_count{{{rotulo}}} {tela["reruns"]}')
+        segundo_plano = self.segundo_plano()
+        for metrica, chave, ajuda in (
+            ("cardapio_firestore_leituras_total", "leituras", "Documentos lidos do Firestore."),
+            ("cardapio_firestore_escritas_total", "escritas", "Documentos gravados no Firestore."),
+            ("cardapio_impressoes_total", "impressoes", "Cupons colocados na fila de impressão."),
+        ):
+            linhas.append(f"# HELP {metrica} {ajuda}")
+            linhas.append(f"# TYPE {metrica} counter")
+            for tela in resumo:
+                linhas.append(f'{metrica}{{tela="{tela["tela"]}"}} {tela[chave]}')
+            linhas.append(f'{metrica}{{tela="{SEGUNDO_PLANO}"}} {segundo_plano[chave]}')
+        return "\n".join(linhas) + "\n"
+
+    def _exportar(self, medicao):
+        try:
+            if self._arquivo_log:
+                with open(self._arquivo_log, "a", encoding="utf-8") as arquivo:
+                    arquivo.write(json.dumps(medicao.como_dict(), ensure_ascii=False) + "\n")
+            agora = _time.monotonic()
+            if self._arquivo_metricas and agora - self._exportado_em >= self._intervalo_exportacao:
+                self._exportado_em = agora
+                temporario = f"{self._arquivo_metricas}.tmp"
+                with open(temporario, "w", encoding="utf-8") as arquivo:
+                    arquivo.write(self.texto_prometheus())
+                os.replace(temporario, self._arquivo_metricas)
+        except OSError:
+            # Métricas nunca derrubam a tela.
+            pass
+
+
+# --- Embrulho do cliente do Firestore ---
+
+def _desembrulhar(valor):
+    if isinstance(valor, _Embrulho):
+        return valor._alvo
+    if isinstance(valor, (list, tuple)):
+        return type(valor)(_desembrulhar(v) for v in valor)
+    return valor
+
+
+def _descrever_filtro(args, kwargs):
+    filtro = kwargs.get("filter")
+    if filtro is not None:
+        return f"where {getattr(filtro, 'field_path', '?')} {getattr(filtro, 'op_string', '?')}"
+    if len(args) >= 2:
+        return f"where {args[0]} {args[1]}"
+    return "where"
+
+
+class _Embrulho:
+    """Repassa tudo ao objeto real, contando e cronometrando as idas ao Firestore."""
+
+    def __init__(self, alvo, instrumentacao, forma):
+        object.__setattr__(self, "_alvo", alvo)
+        object.__setattr__(self, "_instr", instrumentacao)
+        object.__setattr__(self, "_forma", forma)
+
+    def __getattr__(self, nome):
+        atributo = getattr(self._alvo, nome)
+        if not callable(atributo) or nome.startswith("__"):
+            return self._embrulhar(atributo, self._forma)
+        return lambda *args, **kwargs: self._chamar(nome, atributo, args, kwargs)
+
+    def __setattr__(self, nome, valor):
+        setattr(self._alvo, nome, valor)
+
+    def __eq__(self, outro):
+        return self._alvo == _desembrulhar(outro)
+
+    def __hash__(self):
+        return hash(self._alvo)
+
+    def __repr__(self):
+        return f"<instrumentado {self._alvo!r}>"
+
+    def _embrulhar(self, valor, forma):
+        # Duck typing: serve para o cliente real e para o de memória dos benchmarks.
+        if isinstance(valor, _Embrulho) or valor is None or isinstance(valor, (str, int, float, bool, bytes, dict, list, tuple)):
+            return valor
+        if hasattr(valor, "stream") or hasattr(valor, "commit") or (hasattr(valor, "create") and hasattr(valor, "update")):
+            return _Embrulho(valor, self._instr, forma)
+        return valor
+
+    def _cronometrar(self, forma, funcao, leituras=0, escritas=0):
+        inicio = _time.perf_counter()
+        try:
+            return funcao()
+        finally:
+            self._instr.registrar_firestore(forma, leituras=leituras, escritas=escritas, ms=(_time.perf_counter() - inicio) * 1000)
+
+    def _chamar(self, nome, metodo, args, kwargs):
+        args = _desembrulhar(args)
+        kwargs = {chave: _desembrulhar(valor) for chave, valor in kwargs.items()}
+        alvo = self._alvo
+        eh_lote = hasattr(alvo, "commit")
+        eh_consulta = hasattr(alvo, "stream")
+
+        # Montagem de consultas: só acumula a forma.
+        if nome == "collection":
+            return self._embrulhar(metodo(*args, **kwargs), args[0] if args else "")
+        if eh_consulta and nome in ("where", "order_by", "limit", "start_after", "start_at", "end_before", "select", "offset"):
+            if nome == "where":
+                parte = _descrever_filtro(args, kwargs)
+            elif nome == "order_by":
+                parte = f"order_by {args[0] if args else kwargs.get('field_path')}"
+            elif nome == "select":
+                parte = f"select({','.join(args[0]) if args else ''})"
+            else:
+                parte = nome
+            return self._embrulhar(metodo(*args, **kwargs), f"{self._forma} {parte}")
+        if nome == "document":
+            return self._embrulhar(metodo(*args, **kwargs), f"{self._forma}/<doc>")
+
+        # Leituras.
+        if eh_consulta and nome in ("stream", "get"):
+            inicio = _time.perf_counter()
+            documentos = list(metodo(*args, **kwargs))
+            self._instr.registrar_firestore(self._forma, leituras=max(len(documentos), 1), ms=(_time.perf_counter() - inicio) * 1000)
+            return iter(documentos) if nome == "stream" else documentos
+        if nome == "get_all":
+            referencias = list(args[0]) if args else list(kwargs.pop("references", []))
+            inicio = _time.perf_counter()
+            documentos = list(metodo(referencias, *args[1:], **kwargs))
+            self._instr.registrar_firestore("get_all", leituras=len(referencias), ms=(_time.perf_counter() - inicio) * 1000)
+            return documentos
+        if nome == "on_snapshot":
+            # O listener cobra uma leitura por documento que chega (todos, no primeiro snapshot).
+            forma, callback = f"{self._forma} (listener)", args[0]
+
+            def callback_contado(docs, changes, read_time):
+                self._instr.registrar_firestore(forma, leituras=len(changes), chamada=False)
+                return callback(docs, changes, read_time)
+            return metodo(callback_contado, *args[1:], **kwargs)
+        if not eh_lote and nome == "get":
+            return self._cronometrar(self._forma, lambda: metodo(*args, **kwargs), leituras=1)
+
+        # Escritas: nos lotes e transações contam quando são pedidas; o commit só é cronometrado.
+        if nome in ("set", "create", "update", "delete", "add"):
+            if eh_lote:
+                self._instr.registrar_firestore(None, escritas=1, chamada=False)
+                return metodo(*args, **kwargs)
+            return self._embrulhar(self._cronometrar(self._forma, lambda: metodo(*args, **kwargs), escritas=1), self._forma)
+        if eh_lote and nome in ("commit", "_commit"):
+            return self._cronometrar(None, lambda: metodo(*args, **kwargs))
+
+        return self._embrulhar(metodo(*args, **kwargs), self._forma)
@@ -0,0 +1,72 @@
+# --- PAGINAÇÃO DAS LISTAS LONGAS ---
+#
+# O cardápio e os usuários no admin, as comandas do caixa e os pedidos pagos
+# da cozinha aparecem uma página de tamanho fixo por vez: o custo de um rerun
+# (widgets desenhados, documentos lidos) depende do tamanho da página e não
+# do tamanho da coleção.
+#
+# Listas que já estão em memória (vindas dos listeners) são filtradas e
+# fatiadas aqui mesmo. Os pedidos pagos crescem sem limite e são lidos do
+# Firestore uma página por vez, com cursor: `start_after` no último
+# documento da página anterior e `limit(tamanho + 1)` para saber se existe
+# uma próxima.
+
+import unicodedata
+
+TAMANHO_PAGINA = 20
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos, para a busca achar "acai" em "Açaí"."""
+    texto = unicodedata.normalize("NFKD", str(texto or "")).lower()
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def filtrar(documentos, busca, campos):
+    """Documentos em que algum dos `campos` contém a `busca` (todos, se a busca estiver vazia)."""
+    termo = normalizar(busca).strip()
+    if not termo:
+        return list(documentos)
+    return [doc for doc in documentos if any(termo in normalizar(doc.get(campo)) for campo in campos)]
+
+
+def fatiar(itens, pagina, tamanho=TAMANHO_PAGINA):
+    """Retorna (página, itens da página, número de páginas), com a página trazida para o intervalo válido."""
+    paginas = max((len(itens) + tamanho - 1) // tamanho, 1)
+    pagina = min(max(pagina, 0), paginas - 1)
+    return pagina, itens[pagina * tamanho:(pagina + 1) * tamanho], paginas
+
+
+class PaginasCursor:
+    """Páginas de uma consulta ordenada do Firestore, lidas uma por vez.
+
+    Guarda o último documento de cada página já vista, então voltar e
+    avançar não relê as páginas anteriores. Uma instância por consulta
+    (mudou o filtro, cria outra).
+    """
+
+    def __init__(self, tamanho=TAMANHO_PAGINA):
+        self.tamanho = tamanho
+        self.pagina = 0
+        self.tem_proxima = False
+        # cursores[i] é o último documento antes da página i.
+        self._cursores = [None]
+
+    def ler(self, consulta):
+        """Os documentos da página atual."""
+        cursor = self._cursores[self.pagina]
+        if cursor is not None:
+            consulta = consulta.start_after(cursor)
+        documentos = list(consulta.limit(self.tamanho + 1).stream())
+        self.tem_proxima = len(documentos) > self.tamanho
+        documentos = documentos[:self.tamanho]
+        if self.tem_proxima and len(self._cursores) == self.pagina + 1:
+            self._cursores.append(documentos[-1])
+        return documentos
+
+    def avancar(self):
+        if self.pagina + 1 < len(self._cursores):
+            self.pagina += 1
+
+    def voltar(self):
+        self.pagina = max(self.pagina - 1, 0)
@@ -0,0 +1,268 @@
+# --- GRAVAÇÃO DE PEDIDOS (COMANDAS) ---
+#
+# Cada comanda aberta mora num documento de id fixo, derivado do
+# identificador ("Mesa 5" -> pedidos/comanda-mesa-5-<hash>). Encontrar,
+# acrescentar e fechar a comanda são operações diretas nesse documento, sem
+# consultas e sem depender do tamanho do histórico.
+#
+# Os itens ficam compactados em `linhas` (uma por nome, preço e obs; ver
+# precos.itens_do_pedido) e são acrescentados com Increment na quantidade de
+# cada linha, por caminho de campo (`linhas.<chave>.quantidade`): o servidor
+# soma tudo numa única escrita atômica, sem ler nem regravar as outras
+# linhas. Assim dois garçons lançando na mesma mesa ao mesmo tempo não
+# apagam os itens um do outro. Cada envio fica registrado, compacto, em
+# `rodadas` (id, garçom, hora e a quantidade de cada linha).
+#
+# Ao pagar, a comanda é movida para `<id>-<abertura>` (a abertura é o
+# carimbo de quando ela foi aberta), liberando o id fixo para a próxima. Na
+# mesma transação o pagamento é somado ao resumo de vendas do dia.
+
+import hashlib
+import re
+import unicodedata
+import uuid
+from datetime import datetime, timezone
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from cozinha import gravar_tickets
+from precos import chave_linha, compactar_itens, itens_do_pedido, total_itens_centavos, total_pedido_centavos
+from relatorios import registrar_pagamento_no_resumo
+
+
+def id_comanda_aberta(identificador):
+    """Id fixo do documento da comanda aberta de um identificador ("Mesa 5", "João")."""
+    texto = unicodedata.normalize("NFKD", identificador).encode("ascii", "ignore").decode("ascii")
+    slug = re.sub(r"[^a-z0-9]+", "-", texto.lower()).strip("-")[:60]
+    # O hash separa identificadores que viram o mesmo slug ("João" e "Joao").
+    resumo = hashlib.sha1(identificador.encode("utf-8")).hexdigest()[:8]
+    return f"comanda-{slug}-{resumo}" if slug else f"comanda-{resumo}"
+
+
+def preparar_itens(itens):
+    """Copia os itens do carrinho dando um `id_linha` único a cada um.
+
+    O `id_linha` do primeiro item identifica a rodada: reenviar o mesmo
+    lançamento (o diário tenta de novo após uma falha) não soma nada duas vezes.
+    """
+    return [dict(item, id_linha=uuid.uuid4().hex) for item in itens]
+
+
+def rodada(itens, garcom, em=None):
+    """Registro compacto de um envio, guardado em `rodadas`.
+
+    `em` é a hora do lançamento (datetime ou texto ISO, como vem do diário);
+    sem ela vale a hora atual.
+    """
+    if isinstance(em, str):
+        em = datetime.fromisoformat(em)
+    return {
+        "id": itens[0]["id_linha"],
+        "garcom": garcom,
+        "em": em or datetime.now(timezone.utc),
+        "itens": [{"linha": chave_linha(item), "quantidade": item.get("quantidade", 1)} for item in itens],
+    }
+
+
+def rodadas_gravadas(pedido):
+    """Ids das rodadas já na comanda (e os `id_linha` do formato antigo, que também identificam rodadas)."""
+    ids = {r.get("id") for r in pedido.get("rodadas", ())}
+    ids.update(item.get("id_linha") for item in pedido.get("itens", ()))
+    return ids
+
+
+def linhas_incrementadas(itens):
+    """{chave: linha} com Increment na quantidade, para um set(merge=True)."""
+    linhas = compactar_itens(itens)
+    for linha in linhas.values():
+        linha["quantidade"] = firestore.Increment(linha["quantidade"])
+    return linhas
+
+
+def campos_do_acrescimo(rodadas, itens):
+    """Campos do update que soma os itens à comanda; cada linha vai pelo seu caminho e as outras não são tocadas."""
+    campos = {}
+    for chave, linha in linhas_incrementadas(itens).items():
+        for campo, valor in linha.items():
+            campos[f"linhas.{chave}.{campo}"] = valor
+    campos["rodadas"] = firestore.ArrayUnion(rodadas)
+    campos["total_centavos"] = firestore.Increment(total_itens_centavos(itens))
+    campos["timestamp"] = firestore.SERVER_TIMESTAMP
+    return campos
+
+
+def aplicar_acrescimos_em_lote(db, acrescimos, tentativas=3):
+    """Grava vários acréscimos (de várias comandas) com um get_all e um único WriteBatch.
+
+    Cada acréscimo é um dict com identificador, tipo_identificador, garcom e
+    itens já preparados (com `id_linha`) e vira uma rodada da comanda.
+    Rodadas que já estão na comanda são ignoradas, então reenviar o mesmo
+    lote não duplica nada.
+    Os itens novos também viram tickets no painel da cozinha, no mesmo batch.
+    Retorna {id da comanda: True se foi aberta agora}.
+    """
+    por_comanda = {}
+    for acrescimo in acrescimos:
+        if not acrescimo["itens"]:
+            continue
+        comanda_id = id_comanda_aberta(acrescimo["identificador"])
+        por_comanda.setdefault(comanda_id, []).append(acrescimo)
+    refs = {comanda_id: db.collection("pedidos").document(comanda_id) for comanda_id in por_comanda}
+
+    for tentativa in range(tentativas):
+        snapshots = {snapshot.id: snapshot for snapshot in db.get_all(list(refs.values()))}
+        batch = db.batch()
+        abertas = {}
+        for comanda_id, lancamentos in por_comanda.items():
+            snapshot = snapshots.get(comanda_id)
+            existe = snapshot is not None and snapshot.exists
+            ja_gravadas = rodadas_gravadas(snapshot.to_dict()) if existe else set()
+            novos = [acrescimo for acrescimo in lancamentos if acrescimo["itens"][0]["id_linha"] not in ja_gravadas]
+            abertas[comanda_id] = not existe
+            if not novos:
+                continue
+            itens = [item for acrescimo in novos for item in acrescimo["itens"]]
+            rodadas = [rodada(acrescimo["itens"], acrescimo.get("garcom"), acrescimo.get("em")) for acrescimo in novos]
+            if existe:
+                batch.update(refs[comanda_id], campos_do_acrescimo(rodadas, itens))
+            else:
+                batch.create(refs[comanda_id], {
+                    "identificador": novos[0]["identificador"],
+                    "tipo_identificador": novos[0].get("tipo_identificador"),
+                    "garcom": novos[0].get("garcom"),
+                    "linhas": compactar_itens(itens),
+                    "rodadas": rodadas,
+                    "total_centavos": total_itens_centavos(itens),
+                    "status": "novo",
+                    "timestamp": firestore.SERVER_TIMESTAMP,
+                    "abertura": datetime.now().strftime('%Y%m%d%H%M%S%f'),
+                })
+            for acrescimo in novos:
+                gravar_tickets(batch, db, acrescimo["identificador"], acrescimo.get("garcom"), acrescimo["itens"])
+        try:
+            batch.commit()
+            return abertas
+        except (AlreadyExists, NotFound):
+            # Alguém abriu ou pagou uma dessas comandas entre a leitura e a gravação.
+            if tentativa == tentativas - 1:
+                raise
+
+
+def com_acrescimos_pendentes(comandas, acrescimos):
+    """As comandas abertas somadas aos acréscimos que ainda estão no diário, sem ir ao Firestore.
+
+    Enquanto a conexão está fora o caixa continua vendo (e cobrando) tudo o
+    que foi lançado: comandas que só existem no diário também aparecem. As
+    que têm algo ainda não enviado saem com `sincronizando=True`. Rodadas que
+    já estão na comanda não são somadas de novo.
+    """
+    por_id = {comanda["id"]: comanda for comanda in comandas}
+    for acrescimo in acrescimos:
+        if not acrescimo["itens"]:
+            continue
+        comanda_id = id_comanda_aberta(acrescimo["identificador"])
+        comanda = por_id.get(comanda_id)
+        if comanda is None:
+            comanda = {
+                "id": comanda_id,
+                "identificador": acrescimo["identificador"],
+                "tipo_identificador": acrescimo.get("tipo_identificador"),
+                "garcom": acrescimo.get("garcom"),
+                "status": "novo",
+            }
+        elif acrescimo["itens"][0]["id_linha"] in rodadas_gravadas(comanda):
+            continue
+        # Cópia: os documentos do espelho são compartilhados entre as sessões.
+        linhas = dict(comanda.get("linhas") or {})
+        for chave, linha in compactar_itens(acrescimo["itens"]).items():
+            atual = linhas.get(chave)
+            linhas[chave] = dict(atual, quantidade=atual.get("quantidade", 0) + linha["quantidade"]) if atual else linha
+        rodadas = [*comanda.get("rodadas", ()), rodada(acrescimo["itens"], acrescimo.get("garcom"), acrescimo.get("em"))]
+        por_id[comanda_id] = dict(comanda, linhas=linhas, rodadas=rodadas, sincronizando=True)
+    return list(por_id.values())
+
+
+def consulta_comandas_abertas(db):
+    """Comandas aguardando pagamento, das mais antigas para as mais novas."""
+    return db.collection("pedidos").where(filter=FieldFilter("status", "==", "novo")).order_by("timestamp", direction=firestore.Query.ASCENDING)
+
+
+# Campos que as listas de pedidos mostram com o expander fechado. As consultas
+# das listas usam `select(CAMPOS_RESUMO)`: os itens (a maior parte do
+# documento) só são lidos com `carregar_itens` quando o expander é aberto.
+CAMPOS_RESUMO = ("identificador", "tipo_identificador", "garcom", "total", "total_centavos", "status", "timestamp", "pago_em")
+
+
+def carregar_itens(db, pedido_id):
+    """Só os itens de um pedido (lista vazia se ele não existe mais)."""
+    snapshot = db.collection("pedidos").document(pedido_id).get(field_paths=["itens", "linhas", "rodadas"])
+    if not snapshot.exists:
+        return []
+    return itens_do_pedido(snapshot.to_dict() or {})
+
+
+@firestore.transactional
+def _mover_para_pago(transaction, db, comanda_ref, momento):
+    snapshot = comanda_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return None
+    pedido = snapshot.to_dict()
+    if pedido.get("status") != "novo":
+        return None
+    pedido["status"] = "pago"
+    # O mesmo instante (o do clique no caixa, hora local com fuso) vai para o
+    # `pago_em` e para o resumo do dia, então o pedido cai no mesmo dia nas duas contas.
+    # O pedido pago guarda o total final em centavos, sem o `total` antigo em reais.
+    pedido["total_centavos"] = total_pedido_centavos(pedido)
+    pedido.pop("total", None)
+    abertura = pedido.get("abertura")
+    if abertura:
+        pago_ref = comanda_ref.parent.document(f"{comanda_ref.id}-{abertura}")
+        transaction.create(pago_ref, pedido | {"pago_em": momento})
+        transaction.delete(comanda_ref)
+    else:
+        # Comandas antigas (id aleatório) são pagas no próprio documento.
+        pago_ref = comanda_ref
+        transaction.update(comanda_ref, {"status": "pago", "pago_em": momento, "total_centavos": pedido["total_centavos"], "total": firestore.DELETE_FIELD})
+    registrar_pagamento_no_resumo(transaction, db, pedido, momento)
+    return pedido | {"id": pago_ref.id, "pago_em": momento}
+
+
+def fechar_comanda(db, pedido_id, pago_em=None):
+    """Marca a comanda como paga. Retorna o pedido pago (dict) ou None se ela não estiver mais aberta.
+
+    `pago_em` é quando o caixa confirmou o pagamento; um pagamento que esperou
+    no diário chega depois, mas conta na hora (e no dia) em que foi feito.
+    """
+    comanda_ref = db.collection("pedidos").document(pedido_id)
+    momento = (pago_em or datetime.now()).astimezone()
+    return _mover_para_pago(db.transaction(), db, comanda_ref, momento)
+
+
+def migrar_comandas_abertas(db):
+    """Move comandas abertas com id aleatório (de antes dos ids fixos) para o id fixo."""
+    movidas = 0
+    query = db.collection("pedidos").where(filter=FieldFilter("status", "==", "novo"))
+    for doc in query.stream():
+        pedido = doc.to_dict()
+        identificador = pedido.get("identificador")
+        if not identificador or doc.id == id_comanda_aberta(identificador):
+            continue
+        destino_ref = db.collection("pedidos").document(id_comanda_aberta(identificador))
+        batch = db.batch()
+        batch.set(destino_ref, {
+            "identificador": identificador,
+            "tipo_identificador": pedido.get("tipo_identificador"),
+            "garcom": pedido.get("garcom"),
+            "status": "novo",
+            "abertura": pedido.get("abertura") or datetime.now().strftime('%Y%m%d%H%M%S%f'),
+            "linhas": linhas_incrementadas(itens_do_pedido(pedido)),
+            "total_centavos": firestore.Increment(total_pedido_centavos(pedido)),
+            "timestamp": pedido.get("timestamp") or firestore.SERVER_TIMESTAMP,
+        }, merge=True)
+        batch.delete(doc.reference)
+        batch.commit()
+        movidas += 1
+    return movidas
@@ -0,0 +1,154 @@
+# --- PREÇOS (CENTAVOS INTEIROS) ---
+#
+# Toda conta de dinheiro do app passa por aqui e é feita em centavos (int):
+# somar 0.1 + 0.2 em float dá 0.30000000000000004, e essas sobras se
+# acumulavam no total do carrinho, da comanda e dos relatórios. Os preços
+# continuam gravados em reais (`preco_unitario`) para as telas e documentos
+# antigos; itens novos levam também `preco_unitario_centavos`. Totais e somas
+# que crescem com Increment (`total_centavos` da comanda, `faturamento_centavos`
+# dos resumos) são gravados só em centavos, para não acumular sobras no banco.
+#
+# A composição de um item (produto base + opções escolhidas) é memorizada
+# por índice do catálogo: o mesmo sanduíche montado de novo a cada rerun não
+# é recalculado, e uma nova versão do catálogo gera um novo índice (e novas
+# composições).
+#
+# Os itens de uma comanda ficam compactados em `linhas`: uma entrada por
+# (nome, preço unitário, observação), cuja quantidade cresce a cada envio.
+# Dez rodadas de "1x Coca-Cola" viram uma linha "10x Coca-Cola", e o
+# documento, a tela do caixa e o cupom não crescem com o número de rodadas.
+# Pedidos antigos têm o array `itens` (uma entrada por item do carrinho);
+# `itens_do_pedido` lê os dois formatos e é por ela que os itens são lidos.
+
+import hashlib
+from collections import namedtuple
+from functools import lru_cache
+
+
+def centavos(valor):
+    """Reais (float, int ou None) -> centavos inteiros."""
+    return int(round((valor or 0) * 100))
+
+
+def reais(valor_centavos):
+    return valor_centavos / 100
+
+
+def formatar(valor_centavos):
+    return f"R$ {reais(valor_centavos):.2f}"
+
+
+def centavos_gravados(dados, campo):
+    """Valor de um campo de dinheiro de um documento: `<campo>_centavos` mais o `<campo>` antigo, em reais."""
+    return dados.get(f"{campo}_centavos", 0) + centavos(dados.get(campo))
+
+
+def preco_unitario_centavos(item):
+    if "preco_unitario_centavos" in item:
+        return item["preco_unitario_centavos"]
+    return centavos(item.get("preco_unitario", 0))
+
+
+def valor_item_centavos(item):
+    return preco_unitario_centavos(item) * item.get("quantidade", 1)
+
+
+def total_itens_centavos(itens):
+    return sum(valor_item_centavos(item) for item in itens)
+
+
+def total_pedido_centavos(pedido):
+    """Total de um pedido/comanda: a soma dos itens, ou o total gravado se os itens não vieram."""
+    if "itens" in pedido or "linhas" in pedido:
+        return total_itens_centavos(itens_do_pedido(pedido))
+    return centavos_gravados(pedido, "total")
+
+
+# --- Linhas do pedido (itens compactados) ---
+
+CAMPOS_LINHA = ("nome", "obs", "categoria")
+
+
+def chave_linha(item):
+    """Chave da linha de (nome, preço, obs). Só letras e números: serve de nome de campo no Firestore."""
+    texto = f"{item.get('nome', '')}\x1f{preco_unitario_centavos(item)}\x1f{item.get('obs') or ''}"
+    return "l" + hashlib.sha1(texto.encode("utf-8")).hexdigest()[:16]
+
+
+def compactar_itens(itens):
+    """{chave: linha}, somando a quantidade dos itens iguais, na ordem em que apareceram."""
+    linhas = {}
+    for item in itens:
+        chave = chave_linha(item)
+        if chave in linhas:
+            linhas[chave]["quantidade"] += item.get("quantidade", 1)
+            continue
+        linha = {campo: item[campo] for campo in CAMPOS_LINHA if campo in item}
+        linha["preco_unitario_centavos"] = preco_unitario_centavos(item)
+        linha["preco_unitario"] = reais(linha["preco_unitario_centavos"])
+        linha["quantidade"] = item.get("quantidade", 1)
+        linhas[chave] = linha
+    return linhas
+
+
+def itens_do_pedido(pedido):
+    """Os itens do pedido, uma linha por (nome, preço, obs), com as quantidades somadas.
+
+    Junta o formato antigo (`itens`) e o compacto (`linhas`). As linhas saem
+    na ordem em que foram lançadas pela primeira vez (segundo as `rodadas`).
+    """
+    linhas = compactar_itens(pedido.get("itens", ()))
+    compactas = pedido.get("linhas") or {}
+    ordem = list(linhas)
+    for rodada in pedido.get("rodadas", ()):
+        ordem.extend(entrada["linha"] for entrada in rodada.get("itens", ()))
+    ordem.extend(compactas)
+    resultado = []
+    for chave in dict.fromkeys(ordem):
+        linha, compacta = linhas.get(chave), compactas.get(chave)
+        if compacta is None and linha is None:
+            continue
+        if linha is None:
+            linha = dict(compacta)
+        elif compacta is not None:
+            linha = dict(linha, quantidade=linha["quantidade"] + compacta.get("quantidade", 0))
+        resultado.append(linha)
+    return resultado
+
+
+ItemComposto = namedtuple("ItemComposto", "nome preco_centavos")
+
+
+@lru_cache(maxsize=4096)
+def compor_item(indice, categoria, nome_base, opcoes=()):
+    """Nome e preço de um produto com opções, ex.: ("Carne", "Bacon").
+
+    `opcoes` é uma tupla de (tipo, nome). O nome fica "X-Tudo com Bacon e
+    Frango". Retorna None se o produto não está disponível no índice.
+    """
+    base = indice.produto(categoria, nome_base)
+    if base is None:
+        return None
+    preco = centavos(base.get("preco_base", 0))
+    nomes = []
+    for tipo, nome_opcao in opcoes:
+        opcao = indice.opcao(tipo, nome_opcao)
+        if opcao is None:
+            continue
+        preco += centavos(opcao.get("preco_adicional", 0))
+        nomes.append(nome_opcao)
+    nome = base.get("nome", nome_base)
+    if nomes:
+        nome += f" com {' e '.join(nomes)}"
+    return ItemComposto(nome, preco)
+
+
+def item_do_carrinho(composto, quantidade, obs, categoria):
+    return {
+        "nome": composto.nome,
+        "preco_unitario": reais(composto.preco_centavos),
+        "preco_unitario_centavos": composto.preco_centavos,
+        "quantidade": quantidade,
+        "obs": obs,
+        "categoria": categoria,
+    }
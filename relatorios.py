@@ -0,0 +1,290 @@
+# --- RELATÓRIOS DE VENDAS ---
+#
+# Resumos materializados: cada pagamento soma, na mesma transação que fecha a
+# comanda, o seu valor no documento `resumos_diarios/<AAAA-MM-DD>`:
+#
+#   faturamento_centavos, pedidos           -> totais do dia
+#   produtos.<nome>                         -> quantidade vendida de cada item
+#   horas.<HH>.faturamento_centavos/pedidos -> totais por hora
+#
+# O faturamento é somado em centavos inteiros; resumos antigos têm
+# `faturamento` em reais e são lidos com precos.centavos_gravados.
+#
+# O relatório do dia passa a ser a leitura de um único documento.
+#
+# Relatórios de períodos (semana, mês...) percorrem os pedidos pagos em
+# páginas com cursor (`start_after`), somando tudo à medida que as páginas
+# chegam; a memória usada depende do tamanho da página, não do período.
+#
+# Tudo é separado por dia pelo `pago_em` (não pelo `timestamp`, que é a hora
+# do último lançamento), com a meia-noite no horário local: resumo do dia,
+# lista de pagos e relatórios de período contam o mesmo pedido no mesmo dia.
+# Pedidos pagos antes de existir o `pago_em` ganham o campo com:
+#   python relatorios.py preencher-pago-em
+# Pedidos antigos saem da coleção `pedidos` para o arquivo mensal
+# (arquivamento.py) e continuam entrando nesses relatórios.
+#
+# Para montar os resumos a partir dos pedidos já pagos:
+#   python relatorios.py reconstruir 2025-07-01 2025-07-31
+
+import csv
+import io
+import sys
+from datetime import datetime, time, timedelta
+
+from google.cloud import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from arquivamento import colecoes_do_periodo
+from precos import formatar, itens_do_pedido, reais, total_pedido_centavos
+
+COLECAO_RESUMOS = "resumos_diarios"
+
+
+def chave_dia(data):
+    return data.strftime('%Y-%m-%d')
+
+
+def inicio_do_dia(data):
+    """Meia-noite local do dia, com fuso (sem fuso o Firestore compararia como UTC)."""
+    return datetime.combine(data, time.min).astimezone()
+
+
+def momento_do_pagamento(pedido):
+    """Quando o pedido foi pago; pedidos antigos não têm `pago_em` e usam o `timestamp`."""
+    momento = pedido.get("pago_em") or pedido.get("timestamp")
+    if momento is not None and getattr(momento, "tzinfo", None) is not None:
+        momento = momento.astimezone().replace(tzinfo=None)
+    return momento
+
+
+def registrar_pagamento_no_resumo(transaction, db, pedido, momento):
+    """Soma um pedido pago ao resumo do dia, dentro da transação do pagamento."""
+    total = total_pedido_centavos(pedido)
+    produtos = {}
+    for item in itens_do_pedido(pedido):
+        nome = item.get("nome", "Item sem nome")
+        produtos[nome] = produtos.get(nome, 0) + item.get("quantidade", 1)
+    resumo_ref = db.collection(COLECAO_RESUMOS).document(chave_dia(momento))
+    transaction.set(resumo_ref, {
+        "dia": chave_dia(momento),
+        "faturamento_centavos": firestore.Increment(total),
+        "pedidos": firestore.Increment(1),
+        "produtos": {nome: firestore.Increment(qtd) for nome, qtd in produtos.items()},
+        "horas": {momento.strftime('%H'): {"faturamento_centavos": firestore.Increment(total), "pedidos": firestore.Increment(1)}},
+    }, merge=True)
+
+
+def ler_resumo_do_dia(db, data):
+    """Retorna o resumo do dia (dict) ou None se não houve vendas."""
+    snapshot = db.collection(COLECAO_RESUMOS).document(chave_dia(data)).get()
+    return snapshot.to_dict() if snapshot.exists else None
+
+
+def iterar_pedidos_pagos(db, inicio, fim, tamanho_pagina=300):
+    """Gera os pedidos pagos de `inicio` a `fim` (datas, inclusive), página por página.
+
+    Os dias já arquivados são lidos das coleções mensais do arquivo (arquivamento.py).
+    """
+    for colecao in colecoes_do_periodo(db, inicio, fim):
+        yield from _iterar_colecao(db, colecao, inicio, fim, tamanho_pagina)
+
+
+def _consulta_pagos(db, colecao, inicio, fim):
+    return db.collection(colecao) \
+        .where(filter=FieldFilter("status", "==", "pago")) \
+        .where(filter=FieldFilter("pago_em", ">=", inicio_do_dia(inicio))) \
+        .where(filter=FieldFilter("pago_em", "<", inicio_do_dia(fim + timedelta(days=1)))) \
+        .order_by("pago_em", direction=firestore.Query.ASCENDING)
+
+
+def _iterar_colecao(db, colecao, inicio, fim, tamanho_pagina):
+    consulta = _consulta_pagos(db, colecao, inicio, fim).limit(tamanho_pagina)
+    ultimo = None
+    while True:
+        pagina = consulta.start_after(ultimo) if ultimo is not None else consulta
+        quantidade = 0
+        for pedido_doc in pagina.stream():
+            quantidade += 1
+            ultimo = pedido_doc
+            yield pedido_doc.to_dict() | {'id': pedido_doc.id}
+        if quantidade < tamanho_pagina:
+            return
+
+
+def pagina_de_pedidos_pagos(db, inicio, fim, tamanho, depois=None):
+    """Uma página dos pedidos pagos de `inicio` a `fim`: (pedidos, cursor da próxima ou None).
+
+    O cursor ("<coleção>/<id do último pedido>") é devolvido ao cliente, que o
+    manda de volta para pedir a página seguinte; cada página lê no máximo
+    `tamanho + 1` pedidos (e o documento do cursor), não importa qual seja.
+    Levanta ValueError se o cursor não for deste período.
+    """
+    colecoes = colecoes_do_periodo(db, inicio, fim)
+    cursor = None
+    if depois:
+        colecao, _, pedido_id = depois.partition("/")
+        if colecao not in colecoes or not pedido_id:
+            raise ValueError(f"Cursor inválido: {depois}")
+        cursor = db.collection(colecao).document(pedido_id).get()
+        if not cursor.exists:
+            raise ValueError(f"Cursor inválido: {depois}")
+        colecoes = colecoes[colecoes.index(colecao):]
+    lidos = []
+    for colecao in colecoes:
+        consulta = _consulta_pagos(db, colecao, inicio, fim)
+        if cursor is not None:
+            consulta, cursor = consulta.start_after(cursor), None
+        # Um a mais que a página, para saber se existe a próxima.
+        lidos += [(colecao, pedido_doc) for pedido_doc in consulta.limit(tamanho + 1 - len(lidos)).stream()]
+        if len(lidos) > tamanho:
+            break
+    proximo = None
+    if len(lidos) > tamanho:
+        lidos = lidos[:tamanho]
+        proximo = f"{lidos[-1][0]}/{lidos[-1][1].id}"
+    return [pedido_doc.to_dict() | {'id': pedido_doc.id} for _, pedido_doc in lidos], proximo
+
+
+class AgregadoPeriodo:
+    """Totais de um período, somados pedido a pedido (valores em centavos)."""
+
+    def __init__(self):
+        self.faturamento_centavos = 0
+        self.pedidos = 0
+        self.itens = {}
+        self.por_garcom = {}
+        self.por_dia = {}
+
+    @property
+    def faturamento(self):
+        return reais(self.faturamento_centavos)
+
+    def adicionar(self, pedido):
+        total = total_pedido_centavos(pedido)
+        self.faturamento_centavos += total
+        self.pedidos += 1
+        garcom = self.por_garcom.setdefault(pedido.get("garcom") or "N/A", {"centavos": 0, "pedidos": 0})
+        garcom["centavos"] += total
+        garcom["pedidos"] += 1
+        momento = momento_do_pagamento(pedido)
+        if momento:
+            dia = self.por_dia.setdefault(chave_dia(momento), {"centavos": 0, "pedidos": 0})
+            dia["centavos"] += total
+            dia["pedidos"] += 1
+        for item in itens_do_pedido(pedido):
+            nome = item.get("nome", "Item sem nome")
+            self.itens[nome] = self.itens.get(nome, 0) + item.get("quantidade", 1)
+
+
+def agregar_periodo(db, inicio, fim):
+    agregado = AgregadoPeriodo()
+    for pedido in iterar_pedidos_pagos(db, inicio, fim):
+        agregado.adicionar(pedido)
+    return agregado
+
+
+COLUNAS_CSV = ["id", "data_hora", "identificador", "garcom", "itens", "total"]
+
+
+def linhas_csv(pedidos):
+    """Gera o CSV linha a linha (cabeçalho primeiro)."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    def linha(valores):
+        escritor.writerow(valores)
+        texto = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return texto
+
+    yield linha(COLUNAS_CSV)
+    for pedido in pedidos:
+        momento = momento_do_pagamento(pedido)
+        itens = "; ".join(f"{item.get('quantidade', 1)}x {item.get('nome', '')}" for item in itens_do_pedido(pedido))
+        yield linha([
+            pedido.get("id"),
+            momento.strftime('%d/%m/%Y %H:%M:%S') if momento else "",
+            pedido.get("identificador", ""),
+            pedido.get("garcom", ""),
+            itens,
+            f"{reais(total_pedido_centavos(pedido)):.2f}",
+        ])
+
+
+def exportar_csv(db, inicio, fim):
+    """O CSV do período em bytes (UTF-8 com BOM, para o Excel), como o st.download_button aceita."""
+    saida = io.StringIO()
+    for texto in linhas_csv(iterar_pedidos_pagos(db, inicio, fim)):
+        saida.write(texto)
+    return saida.getvalue().encode("utf-8-sig")
+
+
+def reconstruir_resumos(db, inicio, fim):
+    """Recalcula os resumos dos dias de `inicio` a `fim` (inclusive) a partir dos pedidos pagos."""
+    resumos = {}
+    dia = inicio
+    while dia <= fim:
+        resumos[chave_dia(dia)] = {"dia": chave_dia(dia), "faturamento_centavos": 0, "pedidos": 0, "produtos": {}, "horas": {}}
+        dia += timedelta(days=1)
+
+    for pedido in iterar_pedidos_pagos(db, inicio, fim):
+        momento = momento_do_pagamento(pedido)
+        resumo = resumos.get(chave_dia(momento)) if momento else None
+        if resumo is None:
+            continue
+        total = total_pedido_centavos(pedido)
+        resumo["faturamento_centavos"] += total
+        resumo["pedidos"] += 1
+        hora = resumo["horas"].setdefault(momento.strftime('%H'), {"faturamento_centavos": 0, "pedidos": 0})
+        hora["faturamento_centavos"] += total
+        hora["pedidos"] += 1
+        for item in itens_do_pedido(pedido):
+            nome = item.get("nome", "Item sem nome")
+            resumo["produtos"][nome] = resumo["produtos"].get(nome, 0) + item.get("quantidade", 1)
+
+    # Um WriteBatch aceita no máximo 500 escritas.
+    chaves = list(resumos)
+    for i in range(0, len(chaves), 500):
+        batch = db.batch()
+        for chave in chaves[i:i + 500]:
+            batch.set(db.collection(COLECAO_RESUMOS).document(chave), resumos[chave])
+        batch.commit()
+    return resumos
+
+
+def preencher_pago_em(db, tamanho_lote=500):
+    """Copia o `timestamp` para o `pago_em` dos pedidos pagos que não o têm. Retorna quantos mudou."""
+    # Não dá para consultar "campo ausente": percorre os pagos lendo só os dois campos.
+    consulta = db.collection("pedidos").where(filter=FieldFilter("status", "==", "pago")).select(["pago_em", "timestamp"])
+    batch, no_lote, preenchidos = db.batch(), 0, 0
+    for pedido_doc in consulta.stream():
+        pedido = pedido_doc.to_dict() or {}
+        if pedido.get("pago_em") is not None or pedido.get("timestamp") is None:
+            continue
+        batch.update(pedido_doc.reference, {"pago_em": pedido["timestamp"]})
+        no_lote += 1
+        preenchidos += 1
+        if no_lote == tamanho_lote:
+            batch.commit()
+            batch, no_lote = db.batch(), 0
+    if no_lote:
+        batch.commit()
+    return preenchidos
+
+
+if __name__ == "__main__":
+    from banco import conectar_firestore
+
+    if len(sys.argv) == 2 and sys.argv[1] == "preencher-pago-em":
+        print(f"{preencher_pago_em(conectar_firestore())} pedidos com pago_em preenchido.")
+        sys.exit(0)
+    if len(sys.argv) != 4 or sys.argv[1] != "reconstruir":
+        print("Uso: python relatorios.py reconstruir AAAA-MM-DD AAAA-MM-DD")
+        print("     python relatorios.py preencher-pago-em")
+        sys.exit(1)
+    data_inicio = datetime.strptime(sys.argv[2], '%Y-%m-%d').date()
+    data_fim = datetime.strptime(sys.argv[3], '%Y-%m-%d').date()
+    for chave, resumo in reconstruir_resumos(conectar_firestore(), data_inicio, data_fim).items():
+        print(f"{chave}: {resumo['pedidos']} pedidos, {formatar(resumo['faturamento_centavos'])}")
@@ -0,0 +1,205 @@
+# --- SPOOL DE IMPRESSÃO ---
+#
+# As telas apenas colocam o texto na fila (um arquivo SQLite local) e seguem
+# em frente. Cada trabalho tem um destino (a URL da impressora) e cada
+# destino tem a sua thread em segundo plano, então as estações imprimem ao
+# mesmo tempo e uma impressora lenta não atrasa as outras. A thread envia os
+# trabalhos em lotes, numa única escrita, tentando de novo com espera
+# crescente quando a impressora falha. Como a fila fica em disco, nada se
+# perde se o app reiniciar e qualquer cupom pode ser reimpresso depois.
+
+import sqlite3
+import threading
+import time as _time
+from contextlib import closing
+
+PENDENTE = "pendente"
+IMPRIMINDO = "imprimindo"
+IMPRESSO = "impresso"
+FALHOU = "falhou"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabalhos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    documento TEXT NOT NULL,
+    texto TEXT NOT NULL,
+    status TEXT NOT NULL,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    proxima_tentativa REAL NOT NULL,
+    erro TEXT,
+    criado_em REAL NOT NULL,
+    atualizado_em REAL NOT NULL,
+    destino TEXT NOT NULL DEFAULT ''
+);
+"""
+
+
+class FilaImpressao:
+    """Fila durável de impressão com uma thread de envio por impressora.
+
+    `obter_impressora(destino)` devolve o backend de `impressoras.py` (qualquer
+    objeto com `enviar_lote([(texto, nome_documento), ...])`) de um destino.
+    """
+
+    def __init__(self, caminho, obter_impressora, max_tentativas=5, espera_base=2.0, espera_maxima=120.0, tamanho_lote=20, tempo_reserva=120.0):
+        self._caminho = caminho
+        # Reserva mais velha que isso é de um processo que caiu no meio do envio.
+        self._tempo_reserva = tempo_reserva
+        self._obter_impressora = obter_impressora
+        self._tamanho_lote = tamanho_lote
+        self._max_tentativas = max_tentativas
+        self._espera_base = espera_base
+        self._espera_maxima = espera_maxima
+        self._parar = threading.Event()
+        self._trava = threading.Lock()
+        self._threads = {}
+        self._acordar = {}
+        with closing(self._conectar()) as con, con:
+            con.executescript(_ESQUEMA)
+            colunas = {linha["name"] for linha in con.execute("PRAGMA table_info(trabalhos)")}
+            if "destino" not in colunas:
+                con.execute("ALTER TABLE trabalhos ADD COLUMN destino TEXT NOT NULL DEFAULT ''")
+            con.execute("DROP INDEX IF EXISTS idx_trabalhos_fila")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_trabalhos_destino ON trabalhos (destino, status, proxima_tentativa)")
+            # Trabalhos interrompidos por uma queda do app voltam para a fila. Os
+            # reservados há pouco podem ser de outra FilaImpressao no mesmo arquivo.
+            con.execute(
+                "UPDATE trabalhos SET status = ? WHERE status = ? AND atualizado_em < ?",
+                (PENDENTE, IMPRIMINDO, _time.time() - self._tempo_reserva),
+            )
+
+    def _conectar(self):
+        con = sqlite3.connect(self._caminho, timeout=10)
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA journal_mode=WAL")
+        return con
+
+    # --- API usada pelas telas ---
+
+    def enfileirar(self, texto, nome_documento="Comanda", destino=""):
+        """Coloca um cupom (bytes já codificados ou texto) na fila e retorna o número do trabalho."""
+        agora = _time.time()
+        with closing(self._conectar()) as con, con:
+            cursor = con.execute(
+                "INSERT INTO trabalhos (documento, texto, status, proxima_tentativa, criado_em, atualizado_em, destino) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (nome_documento, texto, PENDENTE, agora, agora, agora, destino),
+            )
+            id_trabalho = cursor.lastrowid
+        self._acordar_destino(destino)
+        return id_trabalho
+
+    def status(self, id_trabalho):
+        """Retorna o trabalho como dict (sem o texto) ou None se não existir."""
+        with closing(self._conectar()) as con:
+            linha = con.execute(
+                "SELECT id, documento, destino, status, tentativas, erro, criado_em, atualizado_em FROM trabalhos WHERE id = ?",
+                (id_trabalho,),
+            ).fetchone()
+        return dict(linha) if linha else None
+
+    def recentes(self, limite=20):
+        with closing(self._conectar()) as con:
+            linhas = con.execute(
+                "SELECT id, documento, destino, status, tentativas, erro, criado_em, atualizado_em FROM trabalhos ORDER BY id DESC LIMIT ?",
+                (limite,),
+            ).fetchall()
+        return [dict(linha) for linha in linhas]
+
+    def reimprimir(self, id_trabalho):
+        """Enfileira de novo o mesmo texto de um trabalho antigo. Retorna o novo número."""
+        with closing(self._conectar()) as con:
+            linha = con.execute("SELECT documento, texto, destino FROM trabalhos WHERE id = ?", (id_trabalho,)).fetchone()
+        if linha is None:
+            return None
+        return self.enfileirar(linha["texto"], f"{linha['documento']} (reimpressão)", linha["destino"])
+
+    # --- Threads de envio (uma por destino) ---
+
+    def iniciar(self):
+        """Inicia as threads dos destinos que ficaram com trabalhos pendentes."""
+        self._parar.clear()
+        with closing(self._conectar()) as con:
+            destinos = [linha[0] for linha in con.execute("SELECT DISTINCT destino FROM trabalhos WHERE status = ?", (PENDENTE,))]
+        for destino in destinos:
+            self._acordar_destino(destino)
+        return self
+
+    def parar(self, espera=5):
+        self._parar.set()
+        with self._trava:
+            threads = list(self._threads.values())
+            for evento in self._acordar.values():
+                evento.set()
+        for thread in threads:
+            thread.join(espera)
+
+    def _acordar_destino(self, destino):
+        with self._trava:
+            if destino not in self._acordar:
+                self._acordar[destino] = threading.Event()
+            thread = self._threads.get(destino)
+            if not self._parar.is_set() and (thread is None or not thread.is_alive()):
+                thread = threading.Thread(target=self._trabalhar, args=(destino,), name=f"spool-impressao-{destino}", daemon=True)
+                self._threads[destino] = thread
+                thread.start()
+            self._acordar[destino].set()
+
+    def _proximos(self, destino):
+        """Reserva os trabalhos vencidos do destino; retorna (trabalhos, segundos até o próximo).
+
+        A leitura e a reserva ficam numa transação IMMEDIATE: duas filas no
+        mesmo arquivo (ou dois processos) não reservam o mesmo trabalho.
+        """
+        agora = _time.time()
+        with closing(self._conectar()) as con, con:
+            con.execute("BEGIN IMMEDIATE")
+            linhas = con.execute(
+                "SELECT * FROM trabalhos WHERE destino = ? AND proxima_tentativa <= ? AND (status = ? OR (status = ? AND atualizado_em < ?)) ORDER BY id LIMIT ?",
+                (destino, agora, PENDENTE, IMPRIMINDO, agora - self._tempo_reserva, self._tamanho_lote),
+            ).fetchall()
+            if not linhas:
+                seguinte = con.execute(
+                    "SELECT MIN(proxima_tentativa) FROM trabalhos WHERE destino = ? AND status = ?", (destino, PENDENTE)
+                ).fetchone()[0]
+                return [], (seguinte - agora if seguinte is not None else None)
+            con.executemany(
+                "UPDATE trabalhos SET status = ?, atualizado_em = ? WHERE id = ?",
+                [(IMPRIMINDO, agora, linha["id"]) for linha in linhas],
+            )
+        return [dict(linha) for linha in linhas], 0
+
+    def _concluir(self, trabalhos, erro=None):
+        agora = _time.time()
+        with closing(self._conectar()) as con, con:
+            if erro is None:
+                con.executemany(
+                    "UPDATE trabalhos SET status = ?, erro = NULL, tentativas = tentativas + 1, atualizado_em = ? WHERE id = ?",
+                    [(IMPRESSO, agora, trabalho["id"]) for trabalho in trabalhos],
+                )
+                return
+            for trabalho in trabalhos:
+                tentativas = trabalho["tentativas"] + 1
+                status = FALHOU if tentativas >= self._max_tentativas else PENDENTE
+                espera = min(self._espera_base * (2 ** (tentativas - 1)), self._espera_maxima)
+                con.execute(
+                    "UPDATE trabalhos SET status = ?, tentativas = ?, erro = ?, proxima_tentativa = ?, atualizado_em = ? WHERE id = ?",
+                    (status, tentativas, str(erro), agora + espera, agora, trabalho["id"]),
+                )
+
+    def _trabalhar(self, destino):
+        acordar = self._acordar[destino]
+        while not self._parar.is_set():
+            acordar.clear()
+            try:
+                trabalhos, espera = self._proximos(destino)
+            except sqlite3.Error:
+                trabalhos, espera = [], 1.0
+            if not trabalhos:
+                acordar.wait(espera)
+                continue
+            try:
+                self._obter_impressora(destino).enviar_lote([(t["texto"], t["documento"]) for t in trabalhos])
+            except Exception as e:
+                self._concluir(trabalhos, erro=e)
+            else:
+                self._concluir(trabalhos)
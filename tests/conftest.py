@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Os testes importam os módulos do app (raiz) e o Firestore em memória dos benchmarks.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+sys.path.insert(0, RAIZ)
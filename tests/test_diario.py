@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+from diario import DiarioPedidos
+from firestore_memoria import FirestoreMemoria
+from pedidos import id_comanda_aberta
+
+ITENS = [{"nome": "Coca", "preco_unitario": 5.0, "quantidade": 2}]
+
+
+def novo_diario(tmp_path, db):
+    return DiarioPedidos(str(tmp_path / "diario.sqlite3"), db)
+
+
+def comanda_aberta(db, identificador):
+    return db.collection("pedidos").document(id_comanda_aberta(identificador)).get().to_dict()
+
+
+def test_pagamento_sincronizado_depois_conta_na_hora_do_clique(tmp_path):
+    db = FirestoreMemoria()
+    diario = novo_diario(tmp_path, db)
+    diario.registrar_acrescimo("Mesa 1", "Mesa", "ana", ITENS)
+    diario.sincronizar()
+    comanda = comanda_aberta(db, "Mesa 1")
+
+    clique = (datetime.now() - timedelta(hours=2)).astimezone()
+    diario.registrar_pagamento(id_comanda_aberta("Mesa 1"), comanda["abertura"], clique)
+    diario.sincronizar()
+
+    pago = db.collection("pedidos").document(f"{id_comanda_aberta('Mesa 1')}-{comanda['abertura']}").get().to_dict()
+    assert pago["status"] == "pago"
+    assert pago["pago_em"] == clique
+    resumo = db.collection("resumos_diarios").document(clique.strftime('%Y-%m-%d')).get().to_dict()
+    assert resumo["horas"][clique.strftime('%H')]["pedidos"] == 1
+
+
+def test_rodada_guarda_a_hora_do_lancamento(tmp_path):
+    db = FirestoreMemoria()
+    diario = novo_diario(tmp_path, db)
+    antes = datetime.now().astimezone()
+    diario.registrar_acrescimo("Mesa 2", "Mesa", "ana", ITENS)
+    lancado_em = datetime.fromisoformat(diario.acrescimos_pendentes()[0]["em"])
+    diario.sincronizar()
+
+    rodada = comanda_aberta(db, "Mesa 2")["rodadas"][0]
+    assert rodada["em"] == lancado_em
+    assert rodada["em"] >= antes
+
+
+def test_comanda_fica_escondida_so_enquanto_o_pagamento_esta_pendente(tmp_path):
+    db = FirestoreMemoria()
+    diario = novo_diario(tmp_path, db)
+    pedido_id = id_comanda_aberta("Mesa 3")
+    diario.registrar_pagamento(pedido_id, "20261018200000000000")
+    assert (pedido_id, "20261018200000000000") in diario.pagamentos_pendentes()
+
+    # A comanda não existe no banco: o pagamento vai para conflito e a comanda volta ao quadro.
+    diario.sincronizar()
+    assert diario.pagamentos_pendentes() == set()
+    assert len(diario.conflitos()) == 1
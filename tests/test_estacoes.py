@@ -0,0 +1,19 @@
+from estacoes import impressoras_das_estacoes
+
+
+def test_sem_nenhuma_impressora_configurada(monkeypatch):
+    for estacao in ("CREMES", "CHAPA", "BAR", "GERAL"):
+        monkeypatch.delenv(f"IMPRESSORA_{estacao}", raising=False)
+    assert impressoras_das_estacoes() == {}
+
+
+def test_so_a_impressora_de_uma_estacao_pela_variavel(monkeypatch):
+    monkeypatch.setenv("IMPRESSORA_BAR", "tcp://192.168.0.52:9100")
+    assert impressoras_das_estacoes() == {"bar": "tcp://192.168.0.52:9100"}
+
+
+def test_estacoes_sem_impressora_propria_usam_a_padrao(monkeypatch):
+    monkeypatch.delenv("IMPRESSORA_BAR", raising=False)
+    impressoras = impressoras_das_estacoes({"cremes": "tcp://192.168.0.51:9100"}, padrao="arquivo:///tmp/cupons")
+    assert impressoras["cremes"] == "tcp://192.168.0.51:9100"
+    assert impressoras["bar"] == impressoras["geral"] == "arquivo:///tmp/cupons"
@@ -0,0 +1,116 @@
+import socket
+import threading
+import time
+import unittest
+
+from impressoras import ESC_CORTAR_PAPEL, ImpressoraTCP
+
+
+class ServidorImpressora:
+    """Impressora de mentira na porta RAW: guarda os bytes recebidos por conexão."""
+
+    def __init__(self, fechar_apos_receber=False):
+        self.fechar_apos_receber = fechar_apos_receber
+        self.recebido = []
+        self.conexoes = 0
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.bind(("127.0.0.1", 0))
+        self._socket.listen()
+        self.porta = self._socket.getsockname()[1]
+        self._recebeu = threading.Condition()
+        threading.Thread(target=self._aceitar, daemon=True).start()
+
+    def _aceitar(self):
+        while True:
+            try:
+                conexao, _ = self._socket.accept()
+            except OSError:
+                return
+            self.conexoes += 1
+            threading.Thread(target=self._ler, args=(conexao,), daemon=True).start()
+
+    def _ler(self, conexao):
+        with conexao:
+            conexao.settimeout(0.2)
+            while True:
+                try:
+                    dados = conexao.recv(65536)
+                except socket.timeout:
+                    if self.fechar_apos_receber and self.recebido:
+                        # Fecha a conexão ociosa, como as impressoras térmicas fazem.
+                        return
+                    continue
+                if not dados:
+                    return
+                with self._recebeu:
+                    self.recebido.append(dados)
+                    self._recebeu.notify_all()
+
+    def esperar(self, quantidade, timeout=2.0):
+        with self._recebeu:
+            self._recebeu.wait_for(lambda: len(self.recebido) >= quantidade, timeout)
+        return b"".join(self.recebido)
+
+    def fechar(self):
+        self._socket.close()
+
+
+class ImpressoraTCPTeste(unittest.TestCase):
+
+    def test_lote_vai_numa_escrita_so(self):
+        servidor = ServidorImpressora()
+        impressora = ImpressoraTCP("127.0.0.1", servidor.porta)
+        try:
+            impressora.enviar_lote([(b"PEDIDO 1", "1"), (b"PEDIDO 2", "2")])
+            recebido = servidor.esperar(1)
+        finally:
+            impressora.fechar()
+            servidor.fechar()
+        self.assertIn(b"PEDIDO 1", recebido)
+        self.assertIn(b"PEDIDO 2", recebido)
+        self.assertEqual(recebido.count(ESC_CORTAR_PAPEL), 2)
+
+    def test_reaproveita_a_conexao(self):
+        servidor = ServidorImpressora()
+        impressora = ImpressoraTCP("127.0.0.1", servidor.porta)
+        try:
+            impressora.enviar_lote([(b"A", "a")])
+            impressora.enviar_lote([(b"B", "b")])
+            recebido = servidor.esperar(2)
+        finally:
+            impressora.fechar()
+            servidor.fechar()
+        self.assertIn(b"B", recebido)
+        self.assertEqual(servidor.conexoes, 1)
+
+    def test_reconecta_quando_a_impressora_fecha_a_conexao_ociosa(self):
+        servidor = ServidorImpressora(fechar_apos_receber=True)
+        impressora = ImpressoraTCP("127.0.0.1", servidor.porta)
+        try:
+            impressora.enviar_lote([(b"PRIMEIRO", "1")])
+            servidor.esperar(1)
+            time.sleep(0.5)
+            impressora.enviar_lote([(b"SEGUNDO", "2")])
+            recebido = servidor.esperar(2)
+        finally:
+            impressora.fechar()
+            servidor.fechar()
+        self.assertIn(b"SEGUNDO", recebido)
+        self.assertEqual(servidor.conexoes, 2)
+
+    def test_reconecta_depois_do_tempo_ocioso(self):
+        servidor = ServidorImpressora()
+        impressora = ImpressoraTCP("127.0.0.1", servidor.porta, max_ocioso=0.1)
+        try:
+            impressora.enviar_lote([(b"A", "a")])
+            time.sleep(0.2)
+            impressora.enviar_lote([(b"B", "b")])
+            servidor.esperar(2)
+        finally:
+            impressora.fechar()
+            servidor.fechar()
+        self.assertEqual(servidor.conexoes, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
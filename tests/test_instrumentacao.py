@@ -0,0 +1,26 @@
+from instrumentacao import Instrumentacao
+
+
+def test_summary_do_prometheus_traz_soma_e_contagem():
+    instrumentacao = Instrumentacao()
+    for _ in range(3):
+        with instrumentacao.medir("caixa"):
+            pass
+
+    texto = instrumentacao.texto_prometheus()
+
+    assert 'cardapio_rerun_ms_count{tela="caixa"} 3' in texto
+    soma = [linha for linha in texto.splitlines() if linha.startswith('cardapio_rerun_ms_sum{tela="caixa"}')]
+    assert len(soma) == 1
+    assert float(soma[0].split()[-1]) >= 0
+
+
+def test_log_por_rerun_so_com_arquivo_pedido(tmp_path):
+    arquivo_log = tmp_path / "metricas.jsonl"
+    with Instrumentacao(arquivo_log=str(arquivo_log)).medir("caixa"):
+        pass
+    with Instrumentacao().medir("caixa"):
+        pass
+
+    assert len(arquivo_log.read_text(encoding="utf-8").splitlines()) == 1
+    assert list(tmp_path.iterdir()) == [arquivo_log]
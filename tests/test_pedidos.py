@@ -0,0 +1,84 @@
+from datetime import datetime
+
+from firestore_memoria import FirestoreMemoria
+from pedidos import (aplicar_acrescimos_em_lote, com_acrescimos_pendentes, id_comanda_aberta,
+                     migrar_comandas_abertas, preparar_itens, rodadas_gravadas)
+from precos import itens_do_pedido, total_pedido_centavos
+
+COCA = {"nome": "Coca", "preco_unitario": 5.0, "quantidade": 1, "obs": ""}
+XTUDO = {"nome": "X-Tudo", "preco_unitario": 12.5, "quantidade": 1, "obs": ""}
+
+
+def acrescimo(identificador, itens, garcom="ana"):
+    return {"identificador": identificador, "tipo_identificador": "Mesa", "garcom": garcom, "itens": preparar_itens(itens)}
+
+
+def comanda(db, identificador):
+    return db.collection("pedidos").document(id_comanda_aberta(identificador)).get().to_dict()
+
+
+def quantidades(pedido):
+    return {item["nome"]: item["quantidade"] for item in itens_do_pedido(pedido)}
+
+
+def test_o_mesmo_item_em_varias_rodadas_vira_uma_linha():
+    db = FirestoreMemoria()
+    aplicar_acrescimos_em_lote(db, [acrescimo("Mesa 1", [COCA])])
+    aplicar_acrescimos_em_lote(db, [acrescimo("Mesa 1", [COCA, XTUDO])])
+    aplicar_acrescimos_em_lote(db, [acrescimo("Mesa 1", [dict(COCA, quantidade=2)], garcom="bia")])
+
+    pedido = comanda(db, "Mesa 1")
+    assert len(pedido["linhas"]) == 2
+    assert len(pedido["rodadas"]) == 3
+    assert [item["nome"] for item in itens_do_pedido(pedido)] == ["Coca", "X-Tudo"]
+    assert quantidades(pedido) == {"Coca": 4, "X-Tudo": 1}
+    assert pedido["total_centavos"] == total_pedido_centavos(pedido) == 3250
+
+
+def test_comanda_antiga_migrada_recebe_acrescimo_novo():
+    db = FirestoreMemoria()
+    db.semear("pedidos", "aleatorio123", {
+        "identificador": "Mesa 2", "tipo_identificador": "Mesa", "garcom": "ana", "status": "novo",
+        "itens": [dict(COCA, id_linha="antigo1"), dict(COCA, id_linha="antigo2")], "total": 10.0,
+        "timestamp": datetime(2026, 10, 18, 19, 0),
+    })
+
+    assert migrar_comandas_abertas(db) == 1
+    assert db.collection("pedidos").document("aleatorio123").get().exists is False
+    aplicar_acrescimos_em_lote(db, [acrescimo("Mesa 2", [COCA, XTUDO])])
+
+    pedido = comanda(db, "Mesa 2")
+    assert "itens" not in pedido and "total" not in pedido
+    assert quantidades(pedido) == {"Coca": 3, "X-Tudo": 1}
+    assert pedido["total_centavos"] == total_pedido_centavos(pedido) == 2750
+
+
+def test_reenviar_o_mesmo_acrescimo_nao_soma_duas_vezes():
+    db = FirestoreMemoria()
+    lancamento = acrescimo("Mesa 3", [COCA, XTUDO])
+    aplicar_acrescimos_em_lote(db, [lancamento])
+    # O diário reenviou depois de uma falha que, na verdade, tinha gravado.
+    aplicar_acrescimos_em_lote(db, [lancamento])
+    aplicar_acrescimos_em_lote(db, [lancamento, lancamento])
+
+    pedido = comanda(db, "Mesa 3")
+    assert len(pedido["rodadas"]) == 1
+    assert lancamento["itens"][0]["id_linha"] in rodadas_gravadas(pedido)
+    assert quantidades(pedido) == {"Coca": 1, "X-Tudo": 1}
+    assert pedido["total_centavos"] == 1750
+
+
+def test_acrescimo_pendente_ja_gravado_nao_soma_no_quadro():
+    db = FirestoreMemoria()
+    gravado = acrescimo("Mesa 4", [COCA])
+    aplicar_acrescimos_em_lote(db, [gravado])
+    aberta = comanda(db, "Mesa 4") | {"id": id_comanda_aberta("Mesa 4")}
+
+    novo = acrescimo("Mesa 4", [COCA])
+    quadro = com_acrescimos_pendentes([aberta], [gravado, novo])
+
+    assert len(quadro) == 1
+    assert quadro[0]["sincronizando"] is True
+    assert quantidades(quadro[0]) == {"Coca": 2}
+    # O documento do espelho é compartilhado: não pode ter sido alterado.
+    assert quantidades(aberta) == {"Coca": 1}
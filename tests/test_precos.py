@@ -0,0 +1,57 @@
+from catalogo import IndiceCatalogo
+from precos import (centavos, compor_item, formatar, item_do_carrinho, total_itens_centavos,
+                    total_pedido_centavos)
+
+
+def indice_lanches():
+    produtos = [{"categoria": "Lanches", "nome": "X-Tudo", "preco_base": 12.5}]
+    opcoes = [
+        {"tipo": "Adicional", "nome_opcao": "Bacon", "preco_adicional": 0.1},
+        {"tipo": "Adicional", "nome_opcao": "Frango", "preco_adicional": 0.2},
+    ]
+    return IndiceCatalogo(produtos, opcoes)
+
+
+def test_centavos_arredonda_sem_sobras_de_float():
+    assert centavos(12.5) == 1250
+    assert centavos(0.1 + 0.2) == 30
+    assert centavos(19.99) == 1999
+    assert centavos(None) == 0
+    assert formatar(centavos(0.1 + 0.2)) == "R$ 0.30"
+
+
+def test_soma_de_itens_fica_em_centavos_exatos():
+    itens = [{"nome": "Bala", "preco_unitario": 0.1, "quantidade": 1}, {"nome": "Chiclete", "preco_unitario": 0.2, "quantidade": 1}]
+    assert total_itens_centavos(itens) == 30
+    assert total_itens_centavos([{"nome": "Bala", "preco_unitario": 0.1, "quantidade": 3}]) == 30
+
+
+def test_total_antigo_em_reais_e_total_em_centavos():
+    assert total_pedido_centavos({"total": 12.5}) == 1250
+    assert total_pedido_centavos({"total": 0.1 + 0.2}) == 30
+    assert total_pedido_centavos({"total_centavos": 1250}) == 1250
+    # Comanda antiga que ganhou acréscimos em centavos: as duas partes somam.
+    assert total_pedido_centavos({"total": 10.0, "total_centavos": 250}) == 1250
+
+
+def test_total_usa_os_itens_quando_eles_vieram():
+    pedido = {"total": 99.0, "itens": [{"nome": "Coca", "preco_unitario": 5.0, "quantidade": 2}]}
+    assert total_pedido_centavos(pedido) == 1000
+
+
+def test_item_com_adicionais_soma_em_centavos():
+    composto = compor_item(indice_lanches(), "Lanches", "X-Tudo", (("Adicional", "Bacon"), ("Adicional", "Frango")))
+    assert composto.nome == "X-Tudo com Bacon e Frango"
+    assert composto.preco_centavos == 1280
+
+    item = item_do_carrinho(composto, 3, "", "Lanches")
+    assert item["preco_unitario_centavos"] == 1280
+    assert item["preco_unitario"] == 12.8
+    assert total_pedido_centavos({"itens": [item]}) == 3840
+
+
+def test_adicional_fora_do_indice_e_ignorado():
+    composto = compor_item(indice_lanches(), "Lanches", "X-Tudo", (("Adicional", "Ovo"),))
+    assert composto.nome == "X-Tudo"
+    assert composto.preco_centavos == 1250
+    assert compor_item(indice_lanches(), "Lanches", "X-Salada") is None
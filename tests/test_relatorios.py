@@ -0,0 +1,68 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+from firestore_memoria import FirestoreMemoria
+from relatorios import exportar_csv, pagina_de_pedidos_pagos
+
+
+def semear_pago(db, doc_id, momento, itens, colecao="pedidos"):
+    db.semear(colecao, doc_id, {
+        "status": "pago", "identificador": "Mesa 1", "garcom": "ana",
+        "timestamp": momento, "pago_em": momento, "itens": itens,
+    })
+
+
+def test_exportar_csv_passa_pela_conversao_do_download_button():
+    db = FirestoreMemoria()
+    semear_pago(db, "p1", datetime(2026, 10, 17, 20, 0), [{"nome": "Coca", "preco_unitario": 5.0, "quantidade": 2}])
+    semear_pago(db, "p2", datetime(2026, 10, 18, 21, 0), [{"nome": "X-Tudo", "preco_unitario": 12.5, "quantidade": 1}])
+
+    # O botão recebe `data=lambda: exportar_csv(...)` e converte o retorno na hora do clique.
+    def gerar():
+        return exportar_csv(db, date(2026, 10, 17), date(2026, 10, 18))
+
+    dados, _mime = convert_data_to_bytes_and_infer_mime(gerar(), RuntimeError("unsupported"))
+
+    texto = dados.decode("utf-8-sig")
+    linhas = texto.strip().splitlines()
+    assert linhas[0] == "id,data_hora,identificador,garcom,itens,total"
+    assert linhas[1].startswith("p1,17/10/2026 20:00:00,Mesa 1,ana,2x Coca,10.00")
+    assert linhas[2].endswith("1x X-Tudo,12.50")
+    assert dados.startswith(b"\xef\xbb\xbf")
+
+
+def test_exportar_csv_sem_pedidos_traz_so_o_cabecalho():
+    dados = exportar_csv(FirestoreMemoria(), date(2026, 10, 1), date(2026, 10, 2))
+    assert dados.decode("utf-8-sig").strip() == "id,data_hora,identificador,garcom,itens,total"
+
+
+def test_paginas_com_cursor_passam_do_arquivo_para_pedidos():
+    db = FirestoreMemoria()
+    dia = date(2026, 10, 17)
+    db.semear("arquivo_estado", "pedidos", {"ate": "2026-10-18"})
+    inicio = datetime(2026, 10, 17, 18, 0)
+    for i in range(3):
+        semear_pago(db, f"a{i}", inicio + timedelta(minutes=i), [], colecao="pedidos_arquivo_2026_10")
+    for i in range(2):
+        semear_pago(db, f"p{i}", inicio + timedelta(hours=1, minutes=i), [])
+
+    paginas, cursor = [], None
+    while True:
+        pedidos, cursor = pagina_de_pedidos_pagos(db, dia, dia, 2, cursor)
+        paginas.append([pedido["id"] for pedido in pedidos])
+        if cursor is None:
+            break
+
+    assert paginas == [["a0", "a1"], ["a2", "p0"], ["p1"]]
+
+
+def test_pagina_com_cursor_de_outro_periodo_e_recusada():
+    db = FirestoreMemoria()
+    semear_pago(db, "p1", datetime(2026, 10, 17, 20, 0), [])
+    with pytest.raises(ValueError):
+        pagina_de_pedidos_pagos(db, date(2026, 10, 17), date(2026, 10, 17), 2, "pedidos_arquivo_2020_01/p1")
+    with pytest.raises(ValueError):
+        pagina_de_pedidos_pagos(db, date(2026, 10, 17), date(2026, 10, 17), 2, "pedidos/nao-existe")
@@ -0,0 +1,131 @@
+# --- USUÁRIOS, SENHAS E SESSÕES ---
+#
+# O diretório de usuários fica espelhado em memória (listener na coleção
+# `usuarios`), então o login é verificado localmente, sem consulta ao banco.
+# As senhas são guardadas como hash PBKDF2 com sal (`senha_hash`); senhas
+# antigas em texto puro (`senha`) são convertidas no primeiro login correto.
+#
+# Depois do login a sessão recebe um token assinado (HMAC) que vai na URL;
+# se o tablet reconectar, o token é validado localmente e o usuário continua
+# logado sem digitar a senha de novo. O token leva a `versao_sessao` do
+# usuário: sair ou trocar a senha soma 1 nela e todos os tokens já emitidos
+# para ele (inclusive os que ficaram no histórico do navegador) deixam de valer.
+
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time as _time
+
+from google.cloud import firestore
+
+from espelho import EspelhoColecao
+
+ITERACOES_PBKDF2 = 120_000
+VALIDADE_TOKEN_SEGUNDOS = 16 * 60 * 60
+
+
+def gerar_hash_senha(senha, iteracoes=ITERACOES_PBKDF2):
+    sal = secrets.token_bytes(16)
+    resumo = hashlib.pbkdf2_hmac("sha256", senha.encode("utf-8"), sal, iteracoes)
+    return f"pbkdf2_sha256${iteracoes}${sal.hex()}${resumo.hex()}"
+
+
+def conferir_hash_senha(senha, senha_hash):
+    try:
+        algoritmo, iteracoes, sal_hex, resumo_hex = senha_hash.split("$")
+    except (AttributeError, ValueError):
+        return False
+    if algoritmo != "pbkdf2_sha256":
+        return False
+    resumo = hashlib.pbkdf2_hmac("sha256", senha.encode("utf-8"), bytes.fromhex(sal_hex), int(iteracoes))
+    return hmac.compare_digest(resumo.hex(), resumo_hex)
+
+
+def _b64(dados):
+    return base64.urlsafe_b64encode(dados).rstrip(b"=").decode("ascii")
+
+
+def _de_b64(texto):
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+class DiretorioUsuarios:
+    """Usuários em memória, login local e tokens de sessão assinados."""
+
+    def __init__(self, db, chave_sessao=None, ttl_segundos=300, ouvir=True):
+        self._db = db
+        self._espelho = EspelhoColecao(db.collection("usuarios"), ttl_segundos=ttl_segundos, ouvir=ouvir)
+        # Sem chave configurada, os tokens valem enquanto o processo estiver no ar.
+        self._chave = (chave_sessao or secrets.token_hex(32)).encode("utf-8")
+        self._versao_indice = None
+        self._por_nome = {}
+
+    def documentos(self):
+        return self._espelho.documentos()
+
+    def invalidar(self):
+        self._espelho.invalidar()
+
+    def _usuario(self, nome_usuario):
+        documentos = self._espelho.documentos()
+        if self._versao_indice != self._espelho.versao:
+            por_nome = {}
+            for usuario in documentos:
+                por_nome.setdefault(usuario.get("nome_usuario"), usuario)
+            self._por_nome = por_nome
+            self._versao_indice = self._espelho.versao
+        return self._por_nome.get(nome_usuario)
+
+    def verificar_login(self, nome_usuario, senha):
+        """Retorna (True, cargo) se a senha confere, senão (False, None)."""
+        usuario = self._usuario(nome_usuario)
+        if usuario is None or not senha:
+            return False, None
+        if usuario.get("senha_hash"):
+            if not conferir_hash_senha(senha, usuario["senha_hash"]):
+                return False, None
+        elif usuario.get("senha") is not None and hmac.compare_digest(str(usuario["senha"]), senha):
+            # Senha antiga em texto puro: troca pelo hash.
+            self._db.collection("usuarios").document(usuario["id"]).update({"senha_hash": gerar_hash_senha(senha), "senha": firestore.DELETE_FIELD})
+            self.invalidar()
+        else:
+            return False, None
+        return True, usuario.get("cargo")
+
+    def encerrar_sessoes(self, nome_usuario):
+        """Invalida todos os tokens do usuário (ao sair)."""
+        usuario = self._usuario(nome_usuario)
+        if usuario is None:
+            return
+        self._db.collection("usuarios").document(usuario["id"]).update({"versao_sessao": firestore.Increment(1)})
+        self.invalidar()
+
+    def gerar_token(self, nome_usuario, cargo):
+        usuario = self._usuario(nome_usuario) or {}
+        carga = _b64(json.dumps({
+            "u": nome_usuario, "c": cargo, "v": usuario.get("versao_sessao", 0), "exp": int(_time.time()) + VALIDADE_TOKEN_SEGUNDOS,
+        }).encode("utf-8"))
+        assinatura = _b64(hmac.new(self._chave, carga.encode("ascii"), hashlib.sha256).digest())
+        return f"{carga}.{assinatura}"
+
+    def validar_token(self, token):
+        """Retorna (nome_usuario, cargo) se o token é válido, o usuário ainda existe com esse cargo e não saiu desde então."""
+        try:
+            carga, assinatura = token.split(".")
+            esperada = _b64(hmac.new(self._chave, carga.encode("ascii"), hashlib.sha256).digest())
+            if not hmac.compare_digest(assinatura, esperada):
+                return None
+            dados = json.loads(_de_b64(carga))
+        except (AttributeError, ValueError):
+            return None
+        if dados.get("exp", 0) < _time.time():
+            return None
+        usuario = self._usuario(dados.get("u"))
+        if usuario is None or usuario.get("cargo") != dados.get("c") or usuario.get("versao_sessao", 0) != dados.get("v"):
+            return None
+        return dados["u"], dados["c"]
+
+    def fechar(self):
+        self._espelho.fechar()